@@ -4,11 +4,44 @@
 Generates images for visualizing GitHub repository statistics
 """
 
-from src.generate_images import GenerateImages
+from cProfile import Profile
+from os import getenv
+from sys import argv
+from pstats import SortKey, Stats
+from typing import Optional
+
+from src.generate_images import GenerateBatchImages, GenerateImages, print_stats
+from src.profiling import TRACER
+
+PROFILE_TOP_FUNCTIONS: int = 20  # functions listed in the cProfile summary
 
 
 def main():
-    GenerateImages()
+    trace_file_path: Optional[str] = getenv("TRACE_FILE")
+    cprofile_file_path: Optional[str] = getenv("CPROFILE_FILE")
+
+    if trace_file_path:
+        TRACER.start()
+    profile: Optional[Profile] = Profile() if cprofile_file_path else None
+    if profile is not None:
+        profile.enable()
+
+    try:
+        accounts_file_path: str = getenv("ACCOUNTS_FILE")
+        # statistics given as arguments are printed instead of generating images
+        if argv[1:]:
+            print_stats(stats=argv[1:])
+        elif accounts_file_path:
+            GenerateBatchImages(accounts_file_path=accounts_file_path)
+        else:
+            GenerateImages()
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(cprofile_file_path)
+            Stats(profile).sort_stats(SortKey.TIME).print_stats(PROFILE_TOP_FUNCTIONS)
+        if trace_file_path:
+            TRACER.save(file_path=trace_file_path)
 
 
 if __name__ == "__main__":
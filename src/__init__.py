@@ -1,8 +1,14 @@
 __all__ = [
+    "contributor_weeks",
     "db",
     "env_vars",
     "generate_images",
     "github_api_queries",
     "github_repo_stats",
+    "profiling",
+    "record_replay",
+    "request_scheduler",
+    "run_metrics",
+    "svg_template",
     "templates",
 ]
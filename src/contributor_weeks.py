@@ -0,0 +1,262 @@
+#!/usr/bin/python3
+
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from sys import byteorder
+
+try:
+    import numpy
+except ImportError:  # optional, the array module is used without it
+    numpy = None
+
+###############################################################################
+# RepoWeeks class
+###############################################################################
+
+
+class RepoWeeks:
+    """
+    Lines changed in a repo per week, by the user and by the other authors,
+    as columns sorted by week, so that the changes over any range of weeks
+    are summed without going back to the API
+    """
+
+    TYPECODE: str = "q"  # signed 64-bit integers
+
+    def __init__(
+        self,
+        weeks: array,
+        additions: array,
+        deletions: array,
+        other_changes: array,
+    ) -> None:
+        """
+        :param weeks: Unix time of the start of each week, in ascending order
+        :param additions: lines added by the user in each week
+        :param deletions: lines deleted by the user in each week
+        :param other_changes: lines added and deleted by the other authors in
+        each week
+        """
+        self.weeks: array = weeks
+        self.additions: array = additions
+        self.deletions: array = deletions
+        self.other_changes: array = other_changes
+
+    def totals(self, start: int, end: int) -> tuple[int, int, int]:
+        """
+        :param start: Unix time from which weeks starting are counted
+        :param end: Unix time before which weeks starting are counted
+        :return: lines added and deleted by the user, and lines changed by
+        the other authors, in the weeks starting in the range
+        """
+        first: int = bisect_left(self.weeks, start)
+        last: int = bisect_left(self.weeks, end, lo=first)
+        return (
+            sum(self.additions[first:last]),
+            sum(self.deletions[first:last]),
+            sum(self.other_changes[first:last]),
+        )
+
+    def to_columns(self) -> tuple[bytes, bytes, bytes, bytes]:
+        """
+        :return: the columns as little-endian bytes, for storage
+        """
+        columns: list[array] = [
+            array(self.TYPECODE, column)
+            for column in (
+                self.weeks,
+                self.additions,
+                self.deletions,
+                self.other_changes,
+            )
+        ]
+        if byteorder == "big":
+            for column in columns:
+                column.byteswap()
+        weeks, additions, deletions, other_changes = (
+            column.tobytes() for column in columns
+        )
+        return weeks, additions, deletions, other_changes
+
+    @classmethod
+    def from_columns(
+        cls, weeks: bytes, additions: bytes, deletions: bytes, other_changes: bytes
+    ) -> "RepoWeeks":
+        """
+        :return: the weeks stored by to_columns()
+        """
+        columns: list[array] = []
+        for column in (weeks, additions, deletions, other_changes):
+            columns.append(array(cls.TYPECODE, column))
+            if byteorder == "big":
+                columns[-1].byteswap()
+        return cls(*columns)
+
+
+###############################################################################
+# ContributorWeeks class
+###############################################################################
+
+
+class ContributorWeeks:
+    """
+    Contributor statistics of a repo, as returned by
+    /repos/{repo}/stats/contributors, decoded into compact columns with one
+    row per author-week: the start of the week and the lines added and
+    deleted in it. The rows of each author are contiguous, delimited by
+    offsets, so that per-author totals are computed over whole columns at
+    once, with NumPy if it is installed
+    """
+
+    __TYPECODE: str = "q"  # signed 64-bit integers
+
+    def __init__(
+        self,
+        authors: list[str],
+        offsets: array,
+        weeks: array,
+        additions: array,
+        deletions: array,
+    ) -> None:
+        """
+        :param authors: login of each author
+        :param offsets: index of the first row of each author, followed by
+        the number of rows
+        :param weeks: Unix time of the start of each week
+        :param additions: lines added in each week
+        :param deletions: lines deleted in each week
+        """
+        self.authors: list[str] = authors
+        self.offsets: array = offsets
+        self.weeks: array = weeks
+        self.additions: array = additions
+        self.deletions: array = deletions
+
+    @classmethod
+    def from_response(cls, contributors: any) -> "ContributorWeeks":
+        """
+        :param contributors: decoded JSON of /repos/{repo}/stats/contributors
+        :return: its weeks as columns, skipping malformed authors
+        """
+        authors: list[str] = []
+        offsets: array = array(cls.__TYPECODE, [0])
+        weeks: array = array(cls.__TYPECODE)
+        additions: array = array(cls.__TYPECODE)
+        deletions: array = array(cls.__TYPECODE)
+
+        for author_obj in contributors if isinstance(contributors, list) else []:
+            # Handle malformed response from API by skipping this author
+            if not isinstance(author_obj, dict) or not isinstance(
+                author_obj.get("author", {}), dict
+            ):
+                continue
+            author_weeks: list[dict[str, int]] = [
+                week for week in author_obj.get("weeks") or [] if isinstance(week, dict)
+            ]
+            authors.append((author_obj.get("author") or {}).get("login", ""))
+            weeks.extend(week.get("w", 0) for week in author_weeks)
+            additions.extend(week.get("a", 0) for week in author_weeks)
+            deletions.extend(week.get("d", 0) for week in author_weeks)
+            offsets.append(len(weeks))
+
+        return cls(
+            authors=authors,
+            offsets=offsets,
+            weeks=weeks,
+            additions=additions,
+            deletions=deletions,
+        )
+
+    def __len__(self) -> int:
+        return len(self.weeks)
+
+    def week_counts(self) -> list[int]:
+        """
+        :return: number of weeks of each author
+        """
+        return [end - start for start, end in zip(self.offsets, self.offsets[1:])]
+
+    def repo_weeks(self, is_user: list[bool]) -> RepoWeeks:
+        """
+        :param is_user: for each author, whether their changes count as the
+        user's rather than as the other authors'
+        :return: the lines changed by the user and by the other authors in
+        each week
+        """
+        if numpy is not None:
+            weeks, inverse = numpy.unique(
+                numpy.frombuffer(self.weeks, dtype=numpy.int64), return_inverse=True
+            )
+            user_rows = numpy.repeat(
+                numpy.array(is_user, dtype=bool), self.week_counts()
+            )
+            columns: list = [
+                numpy.zeros(len(weeks), dtype=numpy.int64) for _ in range(3)
+            ]
+            for column, values, rows in (
+                (columns[0], self.additions, user_rows),
+                (columns[1], self.deletions, user_rows),
+                (columns[2], self.additions, ~user_rows),
+                (columns[2], self.deletions, ~user_rows),
+            ):
+                numpy.add.at(
+                    column,
+                    inverse[rows],
+                    numpy.frombuffer(values, dtype=numpy.int64)[rows],
+                )
+            return RepoWeeks(
+                *(
+                    array(RepoWeeks.TYPECODE, column.tobytes())
+                    for column in (weeks, *columns)
+                )
+            )
+
+        by_week: dict[int, list[int]] = dict()
+        for author_is_user, start, end in zip(is_user, self.offsets, self.offsets[1:]):
+            for week, additions, deletions in zip(
+                self.weeks[start:end],
+                self.additions[start:end],
+                self.deletions[start:end],
+            ):
+                totals: list[int] = by_week.setdefault(week, [0, 0, 0])
+                if author_is_user:
+                    totals[0] += additions
+                    totals[1] += deletions
+                else:
+                    totals[2] += additions + deletions
+
+        weeks: list[int] = sorted(by_week)
+        return RepoWeeks(
+            weeks=array(RepoWeeks.TYPECODE, weeks),
+            additions=array(RepoWeeks.TYPECODE, (by_week[w][0] for w in weeks)),
+            deletions=array(RepoWeeks.TYPECODE, (by_week[w][1] for w in weeks)),
+            other_changes=array(RepoWeeks.TYPECODE, (by_week[w][2] for w in weeks)),
+        )
+
+    def author_totals(self) -> list[tuple[str, int, int]]:
+        """
+        :return: login, lines added and lines deleted of each author
+        """
+        return list(
+            zip(
+                self.authors,
+                self.__sum_by_author(column=self.additions),
+                self.__sum_by_author(column=self.deletions),
+            )
+        )
+
+    def __sum_by_author(self, column: array) -> list[int]:
+        # totals are differences of the running sum at the author offsets
+        if numpy is not None:
+            running = numpy.concatenate(
+                ([0], numpy.cumsum(numpy.frombuffer(column, dtype=numpy.int64)))
+            )
+            offsets = numpy.frombuffer(self.offsets, dtype=numpy.int64)
+            return (running[offsets[1:]] - running[offsets[:-1]]).tolist()
+
+        running: array = array(self.__TYPECODE, accumulate(column, initial=0))
+        return [
+            running[end] - running[start]
+            for start, end in zip(self.offsets, self.offsets[1:])
+        ]
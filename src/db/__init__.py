@@ -1 +1 @@
-__all__ = ["db"]
+__all__ = ["db", "history", "language_colors", "repo_snapshots", "response_cache"]
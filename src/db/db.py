@@ -1,6 +1,14 @@
 #!/usr/bin/python3
 
 from json import load, dumps
+from os import fsync, makedirs, replace
+from os.path import abspath, dirname, join
+from typing import Optional, TextIO
+
+try:
+    from fcntl import flock, LOCK_EX, LOCK_UN
+except ImportError:  # not available on Windows
+    flock = None
 
 ###############################################################################
 # GitRepoStatsDB class
@@ -8,15 +16,35 @@ from json import load, dumps
 
 
 class GitRepoStatsDB:
-    def __init__(self) -> None:
-        self.__db: dict[str, dict[str, str] | int] | None = None
+    """
+    Stored statistics persisted between runs. Changes are buffered in memory
+    and only written to the database file, all at once, by commit(). The file
+    is locked from loading to commit(), so that a concurrent run waits for
+    this one and then loads its changes instead of overwriting them. Instances
+    of the same process share the lock
+    """
+
+    DB_FILE_PATH: str = join(dirname(abspath(__file__)), "db.json")
+    ACCOUNTS_DIR: str = join(dirname(abspath(__file__)), "accounts")
+    # lock files held by this process and how many instances hold each
+    __locks: dict[str, tuple[TextIO, int]] = dict()
+
+    def __init__(self, file_path: str = DB_FILE_PATH) -> None:
+        self.__file_path: str = file_path
+        self.__is_modified: bool = False
+        self.__is_locked: bool = False
+        self.__lock()
 
         try:
-            with open("src/db/db.json", "r") as db:
-                self.__db = load(fp=db)
+            with open(self.__file_path, "r") as db:
+                self.__db: dict[str, dict[str, str] | int] = load(fp=db)
         except FileNotFoundError:
-            with open("../src/db/db.json", "r") as db:
-                self.__db = load(fp=db)
+            # first run of an account with its own database
+            self.__db = {
+                "views": {"count": "0", "to": "0000-00-00", "from": "0000-00-00"},
+                "pull_requests": "0",
+                "issues": "0",
+            }
 
         self.views: int = int(self.__db["views"]["count"])
         self.views_from_date: str = self.__db["views"]["from"]
@@ -24,35 +52,78 @@ class GitRepoStatsDB:
         self.pull_requests: int = int(self.__db["pull_requests"])
         self.issues: int = int(self.__db["issues"])
 
-    def __update_db(self) -> None:
-        try:
-            with open("src/db/db.json", "w") as db:
-                db.write(dumps(obj=self.__db, indent=2))
-        except FileNotFoundError:
-            with open("../src/db/db.json", "w") as db:
+    def __lock(self) -> None:
+        """
+        Take the lock of the database file, waiting for other runs holding it
+        """
+        if self.__is_locked:
+            return
+        lock_file_path: str = abspath(self.__file_path + ".lock")
+        lock: Optional[TextIO]
+        lock, holders = self.__locks.get(lock_file_path, (None, 0))
+        if lock is None:
+            makedirs(dirname(lock_file_path), exist_ok=True)
+            lock = open(lock_file_path, "w")
+            if flock is not None:
+                flock(lock, LOCK_EX)
+        self.__locks[lock_file_path] = (lock, holders + 1)
+        self.__is_locked = True
+
+    def __unlock(self) -> None:
+        if not self.__is_locked:
+            return
+        lock_file_path: str = abspath(self.__file_path + ".lock")
+        lock, holders = self.__locks.pop(lock_file_path)
+        if holders > 1:
+            self.__locks[lock_file_path] = (lock, holders - 1)
+        else:
+            if flock is not None:
+                flock(lock, LOCK_UN)
+            lock.close()
+        self.__is_locked = False
+
+    def __del__(self) -> None:
+        # runs failing before commit() release the lock without writing
+        self.__unlock()
+
+    def commit(self) -> None:
+        """
+        Write buffered changes to the database file, replacing it atomically,
+        and release the lock taken when it was loaded
+        """
+        if self.__is_modified:
+            self.__lock()
+            makedirs(dirname(self.__file_path), exist_ok=True)
+            tmp_file_path: str = self.__file_path + ".tmp"
+            with open(tmp_file_path, "w") as db:
                 db.write(dumps(obj=self.__db, indent=2))
+                db.flush()
+                fsync(db.fileno())
+            replace(tmp_file_path, self.__file_path)
+            self.__is_modified = False
+        self.__unlock()
 
     def set_views_count(self, views_count: any) -> None:
         self.views = int(views_count)
         self.__db["views"]["count"] = str(self.views)
-        self.__update_db()
+        self.__is_modified = True
 
     def set_views_from_date(self, date: str) -> None:
         self.views_from_date = date
         self.__db["views"]["from"] = self.views_from_date
-        self.__update_db()
+        self.__is_modified = True
 
     def set_views_to_date(self, date: str) -> None:
         self.views_to_date = date
         self.__db["views"]["to"] = self.views_to_date
-        self.__update_db()
+        self.__is_modified = True
 
     def set_pull_requests(self, pull_requests_count: int) -> None:
         self.pull_requests = pull_requests_count
         self.__db["pull_requests"] = str(pull_requests_count)
-        self.__update_db()
+        self.__is_modified = True
 
     def set_issues(self, issues_count: int) -> None:
         self.issues = issues_count
         self.__db["issues"] = str(issues_count)
-        self.__update_db()
+        self.__is_modified = True
@@ -0,0 +1,273 @@
+#!/usr/bin/python3
+
+from hashlib import sha256
+from json import dumps
+from os import makedirs
+from os.path import abspath, dirname, join
+from sqlite3 import Connection, connect
+from typing import Iterable, Optional
+
+###############################################################################
+# StatsHistory class
+###############################################################################
+
+
+class StatsHistory:
+    """
+    SQLite time-series store of statistics history, kept between runs, with
+    the rows of each account apart so that accounts can share the file:
+        - repo_views: daily view counts per repo, unique by (repo, day)
+        - repo_clones: daily clone counts per repo, unique by (repo, day)
+        - repo_weeks: lines changed per repo per week of its history, as
+          columns of little-endian 64-bit integers, split between the changes
+          of the account and those of other authors
+        - contribution_years: total contributions of each past year, which
+          no longer change
+    Writes are buffered in a transaction until commit()
+    """
+
+    DB_FILE_PATH: str = join(
+        dirname(dirname(dirname(abspath(__file__)))), ".cache", "history.sqlite"
+    )
+
+    __SCHEMA: str = """
+        CREATE TABLE IF NOT EXISTS repo_views (
+            account TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            day TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            uniques INTEGER NOT NULL,
+            PRIMARY KEY (account, repo, day)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS repo_views_day ON repo_views (account, day);
+
+        CREATE TABLE IF NOT EXISTS repo_clones (
+            account TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            day TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            uniques INTEGER NOT NULL,
+            PRIMARY KEY (account, repo, day)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS repo_weeks (
+            account TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            weeks BLOB NOT NULL,
+            additions BLOB NOT NULL,
+            deletions BLOB NOT NULL,
+            other_changes BLOB NOT NULL,
+            PRIMARY KEY (account, repo)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS contribution_years (
+            account TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            PRIMARY KEY (account, year)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, file_path: str = DB_FILE_PATH) -> None:
+        makedirs(dirname(abspath(file_path)), exist_ok=True)
+        self.__connection: Connection = connect(file_path)
+        self.__connection.executescript(self.__SCHEMA)
+
+    @staticmethod
+    def repo_key(repo: str, is_private: bool) -> str:
+        """
+        :param repo: the name of the repo in owner/name format
+        :param is_private: whether the repo is private
+        :return: key of the repo in the history, hashed for private repos so
+        that their names are not stored
+        """
+        if not is_private:
+            return repo
+        return "private/" + sha256(repo.encode()).hexdigest()[:16]
+
+    def upsert_views(
+        self, account: str, views: Iterable[tuple[str, str, int, int]]
+    ) -> None:
+        """
+        :param account: login of the account the views are stored for
+        :param views: (repo key, YYYY-MM-DD day, count, uniques) rows
+        """
+        self.__connection.executemany(
+            """
+            INSERT INTO repo_views (account, repo, day, count, uniques)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (account, repo, day) DO UPDATE SET
+                count = excluded.count,
+                uniques = excluded.uniques
+            """,
+            [(account, *row) for row in views],
+        )
+
+    def views_total(
+        self, account: str, repos: Iterable[str], after: str, until: str
+    ) -> int:
+        """
+        :param account: login of the account the views are stored for
+        :param repos: keys of the repos to count the views of
+        :param after: YYYY-MM-DD day after which views are counted
+        :param until: YYYY-MM-DD last day views are counted for
+        :return: total views of the repos in the range of days
+        """
+        (total,) = self.__connection.execute(
+            """
+            SELECT COALESCE(SUM(count), 0) FROM repo_views
+            WHERE account = ? AND day > ? AND day <= ?
+                AND repo IN (SELECT value FROM json_each(?))
+            """,
+            (account, after, until, dumps(list(repos))),
+        ).fetchone()
+        return total
+
+    def first_views_day(
+        self, account: str, repos: Iterable[str], after: str, until: str
+    ) -> Optional[str]:
+        """
+        :param account: login of the account the views are stored for
+        :param repos: keys of the repos to consider the views of
+        :param after: YYYY-MM-DD day after which views are considered
+        :param until: YYYY-MM-DD last day views are considered for
+        :return: first day with views of the repos in the range of days, if any
+        """
+        (day,) = self.__connection.execute(
+            """
+            SELECT MIN(day) FROM repo_views
+            WHERE account = ? AND day > ? AND day <= ?
+                AND repo IN (SELECT value FROM json_each(?))
+            """,
+            (account, after, until, dumps(list(repos))),
+        ).fetchone()
+        return day
+
+    def upsert_clones(
+        self, account: str, clones: Iterable[tuple[str, str, int, int]]
+    ) -> None:
+        """
+        :param account: login of the account the clones are stored for
+        :param clones: (repo key, YYYY-MM-DD day, count, uniques) rows
+        """
+        self.__connection.executemany(
+            """
+            INSERT INTO repo_clones (account, repo, day, count, uniques)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (account, repo, day) DO UPDATE SET
+                count = excluded.count,
+                uniques = excluded.uniques
+            """,
+            [(account, *row) for row in clones],
+        )
+
+    def clones_total(
+        self, account: str, repos: Iterable[str], after: str, until: str
+    ) -> int:
+        """
+        :param account: login of the account the clones are stored for
+        :param repos: keys of the repos to count the clones of
+        :param after: YYYY-MM-DD day after which clones are counted
+        :param until: YYYY-MM-DD last day clones are counted for
+        :return: total clones of the repos in the range of days
+        """
+        (total,) = self.__connection.execute(
+            """
+            SELECT COALESCE(SUM(count), 0) FROM repo_clones
+            WHERE account = ? AND day > ? AND day <= ?
+                AND repo IN (SELECT value FROM json_each(?))
+            """,
+            (account, after, until, dumps(list(repos))),
+        ).fetchone()
+        return total
+
+    def upsert_repo_weeks(
+        self, account: str, repo_weeks: Iterable[tuple[str, bytes, bytes, bytes, bytes]]
+    ) -> None:
+        """
+        :param account: login of the account the changes are split for
+        :param repo_weeks: (repo key, weeks, additions, deletions, other
+        authors' changes) rows, each column as bytes
+        """
+        self.__connection.executemany(
+            """
+            INSERT INTO repo_weeks (
+                account, repo, weeks, additions, deletions, other_changes
+            )
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (account, repo) DO UPDATE SET
+                weeks = excluded.weeks,
+                additions = excluded.additions,
+                deletions = excluded.deletions,
+                other_changes = excluded.other_changes
+            """,
+            [(account, *row) for row in repo_weeks],
+        )
+
+    def repo_weeks_keys(self, account: str) -> set[str]:
+        """
+        :param account: login of the account the changes are split for
+        :return: keys of the repos with stored weeks
+        """
+        return {
+            repo
+            for (repo,) in self.__connection.execute(
+                "SELECT repo FROM repo_weeks WHERE account = ?", (account,)
+            )
+        }
+
+    def repo_weeks(
+        self, account: str, repos: Iterable[str]
+    ) -> dict[str, tuple[bytes, bytes, bytes, bytes]]:
+        """
+        :param account: login of the account the changes are split for
+        :param repos: keys of the repos
+        :return: (weeks, additions, deletions, other authors' changes) columns
+        of each of the repos with stored weeks, keyed by repo key
+        """
+        repos = set(repos)
+        return {
+            repo: tuple(columns)
+            for repo, *columns in self.__connection.execute(
+                """
+                SELECT repo, weeks, additions, deletions, other_changes
+                FROM repo_weeks WHERE account = ?
+                """,
+                (account,),
+            )
+            if repo in repos
+        }
+
+    def upsert_contribution_years(
+        self, account: str, years: Iterable[tuple[int, int]]
+    ) -> None:
+        """
+        :param account: login of the account the contributions are of
+        :param years: (year, total contributions) rows of past years
+        """
+        self.__connection.executemany(
+            """
+            INSERT INTO contribution_years (account, year, total) VALUES (?, ?, ?)
+            ON CONFLICT (account, year) DO UPDATE SET total = excluded.total
+            """,
+            [(account, year, total) for year, total in years],
+        )
+
+    def contribution_years(self, account: str) -> dict[int, int]:
+        """
+        :param account: login of the account the contributions are of
+        :return: total contributions of each past year stored for the account,
+        keyed by year
+        """
+        return dict(
+            self.__connection.execute(
+                "SELECT year, total FROM contribution_years WHERE account = ?",
+                (account,),
+            )
+        )
+
+    def commit(self) -> None:
+        """
+        Write all changes made since the last commit to the database file
+        """
+        self.__connection.commit()
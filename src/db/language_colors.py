@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+
+from asyncio import Task, ensure_future, shield
+from json import load, dump, JSONDecodeError
+from os import makedirs, replace
+from os.path import abspath, dirname, getmtime, join
+from time import time
+from typing import Callable, Coroutine, Optional
+
+###############################################################################
+# LanguageColors class
+###############################################################################
+
+
+class LanguageColors:
+    """
+    Lookup of the colors GitHub uses for languages. Loaded lazily from the
+    color table shipped with the package, overlaid with a local cache file
+    that can be refreshed from the full ozh/github-colors table once expired.
+    """
+
+    BUNDLED_FILE_PATH: str = join(dirname(abspath(__file__)), "language_colors.json")
+    CACHE_FILE_PATH: str = join(
+        dirname(dirname(dirname(abspath(__file__)))), ".cache", "language_colors.json"
+    )
+    CACHE_TTL: int = 30 * 24 * 60 * 60  # seconds
+
+    def __init__(
+        self,
+        bundled_file_path: str = BUNDLED_FILE_PATH,
+        cache_file_path: str = CACHE_FILE_PATH,
+    ) -> None:
+        self.__bundled_file_path: str = bundled_file_path
+        self.__cache_file_path: str = cache_file_path
+        self.__colors: Optional[dict[str, str]] = None
+        self.__is_refreshed: bool = False
+        self.__refresh: Optional[Task] = None
+
+    def __load(self) -> dict[str, str]:
+        if self.__colors is None:
+            self.__colors = dict()
+
+            for file_path in (self.__bundled_file_path, self.__cache_file_path):
+                try:
+                    with open(file_path, "r") as colors:
+                        self.__colors.update(load(fp=colors))
+                except (FileNotFoundError, JSONDecodeError):
+                    continue
+        return self.__colors
+
+    def get(self, language: str) -> Optional[str]:
+        """
+        :param language: name of the language as used by GitHub
+        :return: hex color of the language, or None if not known
+        """
+        return self.__load().get(language)
+
+    def is_stale(self) -> bool:
+        """
+        :return: True if the cache file should be refreshed, at most once a run
+        """
+        if self.__is_refreshed:
+            return False
+
+        try:
+            return time() - getmtime(self.__cache_file_path) > self.CACHE_TTL
+        except OSError:
+            return True
+
+    async def refresh(
+        self,
+        language_colors: Callable[[], Coroutine[any, any, dict[str, dict[str, str]]]],
+    ) -> None:
+        """
+        Refresh the cache file if stale, concurrent callers sharing the one
+        refresh so that the table is downloaded at most once a run
+        :param language_colors: coroutine function returning the table in the
+        ozh/github-colors format
+        """
+        if self.__refresh is None:
+            if not self.is_stale():
+                return
+            self.__refresh = ensure_future(self.__refreshed(language_colors))
+        # shield so that one cancelled caller does not cancel the shared refresh
+        await shield(self.__refresh)
+
+    async def __refreshed(
+        self,
+        language_colors: Callable[[], Coroutine[any, any, dict[str, dict[str, str]]]],
+    ) -> None:
+        self.update(language_colors=await language_colors())
+
+    def update(self, language_colors: dict[str, dict[str, str]]) -> None:
+        """
+        Refresh the cache file from a table in the ozh/github-colors format
+        :param language_colors: language details keyed by language name
+        """
+        self.__is_refreshed = True
+
+        colors: dict[str, str] = {
+            language: details.get("color")
+            for language, details in language_colors.items()
+            if isinstance(details, dict) and details.get("color")
+        }
+        if not colors:
+            return
+        self.__load().update(colors)
+
+        makedirs(dirname(self.__cache_file_path), exist_ok=True)
+        tmp_file_path: str = self.__cache_file_path + ".tmp"
+        with open(tmp_file_path, "w") as cache:
+            dump(obj=colors, fp=cache, separators=(",", ":"))
+        replace(tmp_file_path, self.__cache_file_path)
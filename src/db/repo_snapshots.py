@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+
+from json import load, dump, JSONDecodeError
+from os import makedirs, replace
+from os.path import abspath, dirname, join
+from typing import Optional
+
+###############################################################################
+# RepoSnapshots class
+###############################################################################
+
+
+class RepoSnapshots:
+    """
+    Per-repo aggregates of contributor statistics persisted between runs.
+    Each snapshot is tagged with the time the repo was last pushed to, so it
+    stays valid until the repo is pushed to again.
+    """
+
+    FILE_PATH: str = join(
+        dirname(dirname(dirname(abspath(__file__)))), ".cache", "repo_snapshots.json"
+    )
+
+    def __init__(self, username: str, file_path: str = FILE_PATH) -> None:
+        self.__username: str = username
+        self.__file_path: str = file_path
+        self.__snapshots: dict[str, dict[str, dict[str, any]]] = dict()
+        self.__used: dict[str, dict[str, any]] = dict()
+
+        try:
+            with open(self.__file_path, "r") as snapshots:
+                self.__snapshots = load(fp=snapshots)
+        except (FileNotFoundError, JSONDecodeError):
+            pass
+
+    def get(self, repo: str, pushed_at: Optional[str]) -> Optional[dict[str, any]]:
+        """
+        :param repo: the name of the repo in owner/name format
+        :param pushed_at: time the repo was last pushed to, as given by GitHub
+        :return: stored aggregate of the repo, or None if missing or outdated
+        """
+        snapshot: Optional[dict[str, any]] = self.__snapshots.get(
+            self.__username, {}
+        ).get(repo)
+
+        if (
+            pushed_at is None
+            or snapshot is None
+            or snapshot.get("pushed_at") != pushed_at
+        ):
+            return None
+        self.__used[repo] = snapshot
+        return snapshot.get("aggregate")
+
+    def set(
+        self, repo: str, pushed_at: Optional[str], aggregate: dict[str, any]
+    ) -> None:
+        """
+        :param repo: the name of the repo in owner/name format
+        :param pushed_at: time the repo was last pushed to, as given by GitHub
+        :param aggregate: aggregate of the repo's contributor statistics
+        """
+        if pushed_at is None:
+            return
+        self.__used[repo] = {"pushed_at": pushed_at, "aggregate": aggregate}
+
+    def save(self) -> None:
+        """
+        Write the snapshots used or set in this run, dropping those of repos
+        no longer included. Snapshots of other users saved in the meantime are
+        kept
+        """
+        try:
+            with open(self.__file_path, "r") as snapshots:
+                self.__snapshots = load(fp=snapshots)
+        except (FileNotFoundError, JSONDecodeError):
+            pass
+        self.__snapshots[self.__username] = self.__used
+
+        makedirs(dirname(self.__file_path), exist_ok=True)
+        tmp_file_path: str = self.__file_path + ".tmp"
+        with open(tmp_file_path, "w") as snapshots:
+            dump(obj=self.__snapshots, fp=snapshots, separators=(",", ":"))
+        replace(tmp_file_path, self.__file_path)
@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+
+from collections import OrderedDict
+from json import load, dumps, JSONDecodeError
+from os import makedirs, replace
+from os.path import abspath, dirname, join
+from typing import Optional
+
+###############################################################################
+# ResponseCache class
+###############################################################################
+
+
+class ResponseCache:
+    """
+    On-disk cache of REST API responses keyed by account, URL and query
+    parameters, as GitHub varies its responses by the authorization.
+    Stores the ETag and Last-Modified validators of each response so that
+    requests can be made conditional, with the stored body served when the
+    API answers 304 Not Modified. The total size of stored bodies is bounded
+    by evicting the least recently used entries.
+    """
+
+    CACHE_FILE_PATH: str = join(
+        dirname(dirname(dirname(abspath(__file__)))), ".cache", "response_cache.json"
+    )
+    DEFAULT_MAX_SIZE: int = 50 * 1024 * 1024  # bytes
+
+    def __init__(
+        self, file_path: str = CACHE_FILE_PATH, max_size: int = DEFAULT_MAX_SIZE
+    ) -> None:
+        self.__file_path: str = file_path
+        self.__max_size: int = max_size
+        self.__size: int = 0
+        self.__is_modified: bool = False
+        self.__entries: OrderedDict[str, dict[str, any]] = OrderedDict()
+
+        try:
+            with open(self.__file_path, "r") as cache:
+                entries: dict[str, dict[str, any]] = load(fp=cache)
+        except (FileNotFoundError, JSONDecodeError):
+            entries = dict()
+
+        # entries are stored least recently used first
+        for key, entry in entries.items():
+            self.__entries[key] = entry
+            self.__size += entry.get("size", 0)
+        self.__evict()
+
+    @staticmethod
+    def key(url: str, params: Optional[dict] = None, account: str = "") -> str:
+        """
+        :param url: requested URL
+        :param params: query parameters sent with the request
+        :param account: account the request is made with
+        :return: cache key identifying the request
+        """
+        key: str = f"{account} {url}" if account else url
+        if not params:
+            return key
+        return key + "?" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+
+    def get(self, key: str) -> Optional[dict[str, any]]:
+        """
+        :param key: cache key of the request
+        :return: cached entry with validators and body, or None if not cached
+        """
+        entry: Optional[dict[str, any]] = self.__entries.get(key)
+        if entry is not None:
+            self.__entries.move_to_end(key)
+            self.__is_modified = True
+        return entry
+
+    def conditional_headers(self, key: str) -> dict[str, str]:
+        """
+        :param key: cache key of the request
+        :return: headers to make the request conditional on the cached entry
+        """
+        entry: Optional[dict[str, any]] = self.__entries.get(key)
+        headers: dict[str, str] = dict()
+
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(
+        self,
+        key: str,
+        body: any,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """
+        Store a response, evicting least recently used entries if over size
+        :param key: cache key of the request
+        :param body: deserialized JSON body of the response
+        :param etag: ETag header of the response
+        :param last_modified: Last-Modified header of the response
+        """
+        if etag is None and last_modified is None:
+            return
+
+        if key in self.__entries:
+            self.__size -= self.__entries.pop(key).get("size", 0)
+
+        size: int = len(dumps(obj=body, separators=(",", ":")))
+        if size > self.__max_size:
+            return
+
+        self.__entries[key] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": size,
+            "body": body,
+        }
+        self.__size += size
+        self.__is_modified = True
+        self.__evict()
+
+    def __evict(self) -> None:
+        while self.__size > self.__max_size and self.__entries:
+            _, entry = self.__entries.popitem(last=False)
+            self.__size -= entry.get("size", 0)
+            self.__is_modified = True
+
+    def save(self) -> None:
+        """
+        Write the cache to disk if it has changed since it was loaded
+        """
+        if not self.__is_modified:
+            return
+
+        makedirs(dirname(self.__file_path), exist_ok=True)
+        tmp_file_path: str = self.__file_path + ".tmp"
+        with open(tmp_file_path, "w") as cache:
+            # dumps() serializes with the C encoder, unlike dump()
+            cache.write(dumps(obj=self.__entries, separators=(",", ":")))
+        replace(tmp_file_path, self.__file_path)
+        self.__is_modified = False
@@ -13,6 +13,34 @@ from src.db.db import GitRepoStatsDB
 
 class EnvironmentVariables:
     __DATE_FORMAT: str = "%Y-%m-%d"
+    __DEFAULT_MAX_CONNECTIONS: int = 10
+    __DEFAULT_RESPONSE_CACHE_SIZE_MB: int = 50
+    __DEFAULT_LINES_CHANGED_WINDOW_WEEKS: int = 0
+    __SECRET_PARAMETERS: dict[str, str] = {
+        "EXCLUDED": "exclude_repos",
+        "EXCLUDED_LANGS": "exclude_langs",
+        "EXCLUDED_REPO_LANGS": "exclude_repo_langs",
+        "IS_INCLUDE_FORKED_REPOS": "is_include_forked_repos",
+        "IS_EXCLUDE_CONTRIB_REPOS": "is_exclude_contrib_repos",
+        "IS_EXCLUDE_ARCHIVE_REPOS": "is_exclude_archive_repos",
+        "IS_EXCLUDE_PRIVATE_REPOS": "is_exclude_private_repos",
+        "IS_EXCLUDE_PUBLIC_REPOS": "is_exclude_public_repos",
+        "REPO_VIEWS": "repo_views",
+        "LAST_VIEWED": "repo_last_viewed",
+        "FIRST_VIEWED": "repo_first_viewed",
+        "IS_STORE_REPO_VIEWS": "is_store_repo_view_count",
+        "IS_INCLUDE_REPO_CLONES": "is_include_repo_clones",
+        "MORE_COLLABS": "more_collaborators",
+        "MORE_REPOS": "manually_added_repos",
+        "ONLY_INCLUDED": "only_included_repos",
+        "ONLY_INCLUDED_COLLAB_REPOS": "only_included_collab_repos",
+        "EXCLUDED_COLLAB_REPOS": "exclude_collab_repos",
+        "MORE_COLLAB_REPOS": "more_collab_repos",
+        "MAX_CONNECTIONS": "max_connections",
+        "RESPONSE_CACHE_SIZE_MB": "response_cache_size_mb",
+        "LINES_CHANGED_WINDOW_WEEKS": "lines_changed_window_weeks",
+        "IMAGES": "images",
+    }
 
     def __init__(
         self,
@@ -30,6 +58,7 @@ class EnvironmentVariables:
         repo_last_viewed: Optional[str] = getenv("LAST_VIEWED"),
         repo_first_viewed: Optional[str] = getenv("FIRST_VIEWED"),
         is_store_repo_view_count: str = getenv("IS_STORE_REPO_VIEWS"),
+        is_include_repo_clones: str = getenv("IS_INCLUDE_REPO_CLONES"),
         more_collaborators: Optional[str] = getenv("MORE_COLLABS"),
         manually_added_repos: Optional[str] = getenv("MORE_REPOS"),
         only_included_repos: Optional[str] = getenv("ONLY_INCLUDED"),
@@ -38,11 +67,20 @@ class EnvironmentVariables:
         ),
         exclude_collab_repos: Optional[str] = getenv("EXCLUDED_COLLAB_REPOS"),
         more_collab_repos: Optional[str] = getenv("MORE_COLLAB_REPOS"),
+        max_connections: Optional[str] = getenv("MAX_CONNECTIONS"),
+        response_cache_size_mb: Optional[str] = getenv("RESPONSE_CACHE_SIZE_MB"),
+        lines_changed_window_weeks: Optional[str] = getenv(
+            "LINES_CHANGED_WINDOW_WEEKS"
+        ),
+        images: Optional[str] = getenv("IMAGES"),
+        db_file_path: str = GitRepoStatsDB.DB_FILE_PATH,
+        api_url: Optional[str] = None,
     ) -> None:
-        self.__db: GitRepoStatsDB = GitRepoStatsDB()
+        self.__db: GitRepoStatsDB = GitRepoStatsDB(file_path=db_file_path)
 
         self.username: str = username
         self.access_token: str = access_token
+        self.api_url: Optional[str] = api_url  # None for the GitHub API
 
         if exclude_repos is None:
             self.exclude_repos: set[str] = set()
@@ -133,6 +171,11 @@ class EnvironmentVariables:
             self.__db.set_views_from_date(date=self.repo_first_viewed)
             self.__db.set_views_to_date(date=self.repo_last_viewed)
 
+        self.is_include_repo_clones: bool = (
+            not not is_include_repo_clones
+            and is_include_repo_clones.strip().lower() == "true"
+        )
+
         try:
             self.more_collaborators: int = (
                 int(more_collaborators) if more_collaborators else 0
@@ -173,6 +216,39 @@ class EnvironmentVariables:
         else:
             self.more_collab_repos = {x.strip() for x in more_collab_repos.split(",")}
 
+        try:
+            self.max_connections: int = (
+                max(1, int(max_connections))
+                if max_connections
+                else self.__DEFAULT_MAX_CONNECTIONS
+            )
+        except ValueError:
+            self.max_connections = self.__DEFAULT_MAX_CONNECTIONS
+
+        try:
+            self.response_cache_size_mb: int = (
+                max(0, int(response_cache_size_mb))
+                if response_cache_size_mb
+                else self.__DEFAULT_RESPONSE_CACHE_SIZE_MB
+            )
+        except ValueError:
+            self.response_cache_size_mb = self.__DEFAULT_RESPONSE_CACHE_SIZE_MB
+
+        try:
+            self.lines_changed_window_weeks: int = (
+                max(0, int(lines_changed_window_weeks))
+                if lines_changed_window_weeks
+                else self.__DEFAULT_LINES_CHANGED_WINDOW_WEEKS
+            )
+        except ValueError:
+            self.lines_changed_window_weeks = self.__DEFAULT_LINES_CHANGED_WINDOW_WEEKS
+
+        # all images are generated when none are given
+        if images is None:
+            self.images: set[str] = set()
+        else:
+            self.images = {x.strip().lower() for x in images.split(",") if x.strip()}
+
         self.pull_requests_count: int = self.__db.pull_requests
         self.issues_count: int = self.__db.issues
 
@@ -191,8 +267,48 @@ class EnvironmentVariables:
         environ["FIRST_VIEWED"] = self.repo_first_viewed
         self.__db.set_views_from_date(date=self.repo_first_viewed)
 
+    @classmethod
+    def from_secrets(
+        cls, secrets: dict[str, str], db_file_path: str
+    ) -> "EnvironmentVariables":
+        """
+        :param secrets: settings of an account keyed by the name of the
+        corresponding Secret, with GITHUB_ACTOR and ACCESS_TOKEN for the
+        account's username and access token. Settings not given fall back to
+        the environment
+        :param db_file_path: path to the account's own stored statistics
+        :return: the account's settings
+        """
+        unknown: set[str] = (
+            secrets.keys()
+            - cls.__SECRET_PARAMETERS.keys()
+            - {
+                "GITHUB_ACTOR",
+                "ACCESS_TOKEN",
+            }
+        )
+        if unknown:
+            print(f"Ignoring unknown settings: {', '.join(sorted(unknown))}")
+
+        return cls(
+            username=secrets["GITHUB_ACTOR"],
+            access_token=secrets.get("ACCESS_TOKEN") or getenv("ACCESS_TOKEN"),
+            db_file_path=db_file_path,
+            **{
+                parameter: str(secrets[secret])
+                for secret, parameter in cls.__SECRET_PARAMETERS.items()
+                if secret in secrets
+            },
+        )
+
     def set_pull_requests(self, pull_requests_count: int) -> None:
-        self.__db.pull_requests = pull_requests_count
+        self.__db.set_pull_requests(pull_requests_count=pull_requests_count)
 
     def set_issues(self, issues_count: int) -> None:
-        self.__db.issues = issues_count
+        self.__db.set_issues(issues_count=issues_count)
+
+    def commit(self) -> None:
+        """
+        Persist all stored statistics changed during the run
+        """
+        self.__db.commit()
@@ -1,13 +1,26 @@
 #!/usr/bin/python3
 
-from aiohttp import ClientSession
+from aiohttp import ClientSession, TCPConnector
 from asyncio import run, gather
-from os import mkdir, getenv
-from os.path import isdir
-from re import sub
-
+from asyncio import Task
+from datetime import date, timedelta
+from json import load
+from os import makedirs, getenv
+from os.path import isdir, join
+from typing import Callable, Coroutine, Optional
+from xml.sax.saxutils import escape
+
+from src.db.db import GitRepoStatsDB
+from src.db.history import StatsHistory
+from src.db.language_colors import LanguageColors
+from src.db.repo_snapshots import RepoSnapshots
+from src.db.response_cache import ResponseCache
 from src.github_repo_stats import GitHubRepoStats
+from src.profiling import TRACER
 from src.env_vars import EnvironmentVariables
+from src.request_scheduler import RequestScheduler
+from src.run_metrics import RunMetrics
+from src.svg_template import Markup, SvgTemplate
 
 OUTPUT_DIR: str = "generated_images"  # directory for storing generated images
 TEMPLATE_PATH: str = "src/templates/"
@@ -15,6 +28,26 @@ OVERVIEW_FILE_NAME: str = "overview.svg"
 LANGUAGES_FILE_NAME: str = "languages.svg"
 TXT_SPACER_MAX_LEN: int = 7
 MAX_NAME_LEN: int = 18
+# statistics shown on each image, computed before rendering it
+IMAGE_STATS: dict[str, tuple[str, ...]] = {
+    "overview": (
+        "name",
+        "views",
+        "views_from_date",
+        "forks",
+        "stargazers",
+        "total_contributions",
+        "lines_changed",
+        "avg_contribution_percent",
+        "avg_contribution_percent_weighted",
+        "repos",
+        "contributed_collab_repos",
+        "collaborators",
+        "pull_requests",
+        "issues",
+    ),
+    "languages": ("languages", "excluded_languages"),
+}
 
 
 ###############################################################################
@@ -22,12 +55,63 @@ MAX_NAME_LEN: int = 18
 ###############################################################################
 
 
-def generate_output_folder() -> None:
+def save_run_report(metrics: RunMetrics) -> None:
+    """
+    Write the metrics of the run to the JSON report and Prometheus textfile
+    given by the environment, if any
+    """
+    metrics.save(
+        report_file_path=getenv("RUN_REPORT_FILE"),
+        prometheus_file_path=getenv("PROMETHEUS_FILE"),
+    )
+
+
+def account_environment() -> EnvironmentVariables:
+    """
+    :return: settings of the account given by the environment
+    """
+    access_token: str = getenv("ACCESS_TOKEN")
+    user: str = getenv("GITHUB_ACTOR")
+
+    if not access_token:
+        raise Exception("A personal access token is required to proceed!")
+
+    if not user:
+        raise RuntimeError("Environment variable GITHUB_ACTOR must be set")
+
+    return EnvironmentVariables(username=user, access_token=access_token)
+
+
+def print_stats(stats: list[str]) -> None:
+    """
+    Print the statistics given of the account given by the environment,
+    fetching only what they need, without generating any image or storing
+    any statistic
+    :param stats: names of the statistics to print, e.g. stargazers
+    """
+
+    async def compute() -> dict[str, any]:
+        async with ClientSession() as session:
+            repo_stats: GitHubRepoStats = GitHubRepoStats(
+                environment_vars=account_environment(), session=session
+            )
+            values: dict[str, any] = await repo_stats.compute(stats=stats)
+            repo_stats.queries.save_response_cache()
+        save_run_report(metrics=repo_stats.queries.metrics)
+        return values
+
+    for stat, value in run(main=compute()).items():
+        if isinstance(value, set):
+            value = ", ".join(sorted(value))
+        print(f"{stat}: {value}")
+
+
+def generate_output_folder(output_dir: str = OUTPUT_DIR) -> None:
     """
     Create the output folder if it does not already exist
     """
-    if not isdir(OUTPUT_DIR):
-        mkdir(OUTPUT_DIR)
+    if not isdir(output_dir):
+        makedirs(output_dir)
 
 
 def add_unit(num: str | int) -> str:
@@ -108,20 +192,25 @@ def format_name(name: str, user_name: str) -> str:
 
 
 class GenerateImages:
-    def __init__(self) -> None:
-        access_token: str = getenv("ACCESS_TOKEN")
-        user: str = getenv("GITHUB_ACTOR")
+    def __init__(
+        self,
+        environment_vars: Optional[EnvironmentVariables] = None,
+        output_dir: str = OUTPUT_DIR,
+    ) -> None:
+        """
+        :param environment_vars: settings of the account to generate images for
+        with generate(), or None to generate them right away for the account
+        given by the environment
+        :param output_dir: directory to write the images to
+        """
+        self.__output_dir: str = output_dir
+        self.__stats: GitHubRepoStats | None = None
 
-        if not access_token:
-            raise Exception("A personal access token is required to proceed!")
+        if environment_vars is not None:
+            self.__environment: EnvironmentVariables = environment_vars
+            return
 
-        if not user:
-            raise RuntimeError("Environment variable GITHUB_ACTOR must be set")
-
-        self.__environment: EnvironmentVariables = EnvironmentVariables(
-            username=user, access_token=access_token
-        )
-        self.__stats: GitHubRepoStats | None = None
+        self.__environment = account_environment()
 
         run(main=self.start())
 
@@ -130,27 +219,87 @@ class GenerateImages:
         Main function: generate all badges
         """
         async with ClientSession() as session:
-            self.__stats = GitHubRepoStats(
-                environment_vars=self.__environment, session=session
+            await self.generate(session=session)
+            self.__stats.queries.save_response_cache()
+            self.save()
+        save_run_report(metrics=self.__stats.queries.metrics)
+
+    async def generate(
+        self,
+        session: ClientSession,
+        response_cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        shared_results: Optional[dict[str, Task]] = None,
+        history: Optional[StatsHistory] = None,
+        snapshots: Optional[RepoSnapshots] = None,
+        metrics: Optional[RunMetrics] = None,
+        language_colors: Optional[LanguageColors] = None,
+    ) -> None:
+        """
+        Generate all badges, optionally sharing requests with other accounts
+        """
+        self.__stats = GitHubRepoStats(
+            environment_vars=self.__environment,
+            session=session,
+            response_cache=response_cache,
+            scheduler=scheduler,
+            shared_results=shared_results,
+            history=history,
+            snapshots=snapshots,
+            metrics=metrics,
+            language_colors=language_colors,
+        )
+
+        generators: dict[str, Callable[[], Coroutine]] = {
+            "overview": self.generate_overview,
+            "languages": self.generate_languages,
+        }
+        images: set[str] = self.__environment.images or set(generators)
+        unknown_images: set[str] = images - set(generators)
+        if unknown_images:
+            raise RuntimeError(
+                f"Unknown images {', '.join(sorted(unknown_images))} for "
+                f"{self.__environment.username}, expected any of "
+                f"{', '.join(generators)}"
             )
-            await gather(self.generate_languages(), self.generate_overview())
+
+        # only the statistics shown on the images are computed, all at once
+        await self.__stats.compute(
+            stats=[stat for image in sorted(images) for stat in IMAGE_STATS[image]]
+        )
+
+        async def traced(generate_image: Callable[[], Coroutine]) -> None:
+            with TRACER.span(
+                name=generate_image.__name__,
+                category="image",
+                account=self.__environment.username,
+            ):
+                await generate_image()
+
+        await gather(*(traced(generators[image]) for image in sorted(images)))
+
+    def save(self) -> None:
+        """
+        Persist the statistics history and stored statistics of the account
+        """
+        self.__stats.save_history()
+        self.__environment.commit()
 
     async def generate_overview(self) -> None:
         """
         Generate an SVG badge with summary statistics
         """
-        with open("{}{}".format(TEMPLATE_PATH, OVERVIEW_FILE_NAME), "r") as f:
-            output: str = f.read()
+        values: dict[str, str] = dict()
 
         # svg name display: user's given name first, otherwise username in any best fit variation as depicted below
         name: str = format_name(
             name=await self.__stats.name,
             user_name=self.__stats.environment_vars.username,
         )
-        output = sub(pattern="{{ name }}", repl=name, string=output)
+        values["name"] = name
 
         views: str = f"{await self.__stats.views:,}"
-        output = sub(pattern="{{ views }}", repl=views, string=output)
+        values["views"] = views
 
         forks: str = f"{await self.__stats.forks:,}"
         forks = forks if len(str(forks)) < TXT_SPACER_MAX_LEN else add_unit(forks)
@@ -162,27 +311,34 @@ class GenerateImages:
             + "|   "
             + stars
         )
-        output = sub(
-            pattern="{{ forks_and_stars }}", repl=forks_and_stars, string=output
-        )
+        values["forks_and_stars"] = forks_and_stars
 
         contributions: str = f"{await self.__stats.total_contributions:,}"
-        output = sub(pattern="{{ contributions }}", repl=contributions, string=output)
+        values["contributions"] = contributions
 
         changed: int = (await self.__stats.lines_changed)[0] + (
             await self.__stats.lines_changed
         )[1]
-        output = sub(pattern="{{ lines_changed }}", repl=f"{changed:,}", string=output)
+        values["lines_changed"] = f"{changed:,}"
+        values["lines_changed_label"] = "Lines of code changes"
+
+        window_weeks: int = self.__environment.lines_changed_window_weeks
+        if window_weeks > 0:
+            today: date = date.today()
+            recently_changed: int = sum(
+                await self.__stats.lines_changed_between(
+                    start=today - timedelta(weeks=window_weeks),
+                    end=today + timedelta(days=1),
+                )
+            )
+            values["lines_changed"] += f" [{recently_changed:,}]"
+            values["lines_changed_label"] += f" [{window_weeks}w]"
 
         avg_contribution_percent: str = (
             f"{await self.__stats.avg_contribution_percent} "
             f"[{await self.__stats.avg_contribution_percent_weighted}]"
         )
-        output = sub(
-            pattern="{{ avg_contribution_percent }}",
-            repl=avg_contribution_percent,
-            string=output,
-        )
+        values["avg_contribution_percent"] = avg_contribution_percent
 
         num_repos: int = len(await self.__stats.repos)
         num_collab_repos = len(await self.__stats.contributed_collab_repos)
@@ -194,49 +350,42 @@ class GenerateImages:
         repos_str: str = (
             f"{repos:,} [{'%g' % round(num_collab_repos / num_repos * 100, 2)}%]"
         )
-        output = sub(pattern="{{ repos_str }}", repl=repos_str, string=output)
+        values["repos_str"] = repos_str
 
         collaborators_and_contributors: str = f"{await self.__stats.collaborators:,}"
-        output = sub(
-            pattern="{{ collaborators_and_contributors }}",
-            repl=collaborators_and_contributors,
-            string=output,
-        )
+        values["collaborators_and_contributors"] = collaborators_and_contributors
 
         views_from: str = await self.__stats.views_from_date
-        output = sub(
-            pattern="{{ views_from_date }}",
-            repl=f"Repo views (as of {views_from})",
-            string=output,
+        values["views_from_date"] = f"Repo views (as of {views_from})"
+
+        pull_requests: str = f"{await self.__stats.pull_requests:,}"
+        pull_requests = (
+            pull_requests
+            if len(str(pull_requests)) < TXT_SPACER_MAX_LEN
+            else add_unit(pull_requests)
         )
+        issues: str = f"{await self.__stats.issues:,}"
+        issues = issues if len(str(issues)) < TXT_SPACER_MAX_LEN else add_unit(issues)
+        pull_requests_and_issues: str = (
+            pull_requests
+            + " " * max(1, TXT_SPACER_MAX_LEN - len(str(pull_requests)) + 1)
+            + "|   "
+            + issues
+        )
+        values["pull_requests_and_issues"] = pull_requests_and_issues
+
+        output: str = SvgTemplate.load(
+            file_path="{}{}".format(TEMPLATE_PATH, OVERVIEW_FILE_NAME)
+        ).render(**values)
 
-        # pull_requests: str = f'{await self.__stats.pull_requests:,}'
-        # pull_requests = (
-        #     pull_requests
-        #     if len(str(pull_requests)) < TXT_SPACER_MAX_LEN
-        #     else add_unit(pull_requests)
-        # )
-        # issues: str = f'{await self.__stats.issues:,}'
-        # issues = issues if len(str(issues)) < TXT_SPACER_MAX_LEN else add_unit(issues)
-        # pull_requests_and_issues: str = (
-        #     pull_requests
-        #     + ' ' * max(1, TXT_SPACER_MAX_LEN - len(str(pull_requests)) + 1)
-        #     + '|   '
-        #     + issues
-        # )
-        # output = sub('{{ pull_requests_and_issues }}', pull_requests_and_issues, output)
-
-        generate_output_folder()
-        with open("{}/{}".format(OUTPUT_DIR, OVERVIEW_FILE_NAME), "w") as f:
+        generate_output_folder(output_dir=self.__output_dir)
+        with open("{}/{}".format(self.__output_dir, OVERVIEW_FILE_NAME), "w") as f:
             f.write(output)
 
     async def generate_languages(self) -> None:
         """
         Generate an SVG badge with summary languages used
         """
-        with open("{}{}".format(TEMPLATE_PATH, LANGUAGES_FILE_NAME), "r") as f:
-            output: str = f.read()
-
         progress: str = ""
         lang_list: str = ""
         sorted_languages: list = sorted(
@@ -274,19 +423,119 @@ class GenerateImages:
                             </path>
                     </svg>
                     <span class="lang">
-                        {lang}
+                        {escape(lang)}
                     </span>
                     <span class="percent">
                         {data.get("prop", 0):0.2f}%
                     </span>
             </li>"""
 
-        output = sub(pattern=r"{{ lang_count }}", repl=lang_count, string=output)
+        output: str = SvgTemplate.load(
+            file_path="{}{}".format(TEMPLATE_PATH, LANGUAGES_FILE_NAME)
+        ).render(
+            lang_count=lang_count,
+            progress=Markup(progress),
+            lang_list=Markup(lang_list),
+        )
 
-        output = sub(pattern=r"{{ progress }}", repl=progress, string=output)
+        generate_output_folder(output_dir=self.__output_dir)
+        with open("{}/{}".format(self.__output_dir, LANGUAGES_FILE_NAME), "w") as f:
+            f.write(output)
 
-        output = sub(pattern=r"{{ lang_list }}", repl=lang_list, string=output)
 
-        generate_output_folder()
-        with open("{}/{}".format(OUTPUT_DIR, LANGUAGES_FILE_NAME), "w") as f:
-            f.write(output)
+###############################################################################
+# GenerateBatchImages class
+###############################################################################
+
+
+class GenerateBatchImages:
+    """
+    Generate the badges of several accounts concurrently, sharing one HTTP
+    connection pool, request scheduler, REST response cache, run metrics,
+    language colors and stats history. Results of repos common to several
+    accounts, such as shared organization repos, are only requested once.
+    Each account has its own output directory and stored statistics
+    """
+
+    def __init__(self, accounts_file_path: str) -> None:
+        """
+        :param accounts_file_path: path to a JSON list of account settings,
+        each keyed by Secret name, with GITHUB_ACTOR and ACCESS_TOKEN
+        """
+        with open(accounts_file_path, "r") as f:
+            accounts: list[dict[str, str]] = load(fp=f)
+
+        if not accounts:
+            raise RuntimeError(f"No accounts given in {accounts_file_path}")
+
+        self.__environments: list[EnvironmentVariables] = []
+        for account in accounts:
+            if not account.get("GITHUB_ACTOR"):
+                raise RuntimeError("GITHUB_ACTOR must be set for every account")
+
+            environment: EnvironmentVariables = EnvironmentVariables.from_secrets(
+                secrets=account,
+                db_file_path=join(
+                    GitRepoStatsDB.ACCOUNTS_DIR, account["GITHUB_ACTOR"], "db.json"
+                ),
+            )
+            if not environment.access_token:
+                raise Exception(
+                    f"A personal access token is required to proceed for "
+                    f"{environment.username}!"
+                )
+            self.__environments.append(environment)
+
+        run(main=self.start())
+
+    async def start(self) -> None:
+        """
+        Main function: generate all badges of all accounts
+        """
+        # shared resources are sized for the most demanding account
+        max_connections: int = max(e.max_connections for e in self.__environments)
+        response_cache_size_mb: int = max(
+            e.response_cache_size_mb for e in self.__environments
+        )
+        response_cache: Optional[ResponseCache] = (
+            ResponseCache(max_size=response_cache_size_mb * 1024 * 1024)
+            if response_cache_size_mb > 0
+            else None
+        )
+        scheduler: RequestScheduler = RequestScheduler(max_connections=max_connections)
+        shared_results: dict[str, Task] = dict()
+        metrics: RunMetrics = RunMetrics()
+        language_colors: LanguageColors = LanguageColors()
+        history: StatsHistory = StatsHistory()
+
+        generators: list[GenerateImages] = [
+            GenerateImages(
+                environment_vars=environment,
+                output_dir=join(OUTPUT_DIR, environment.username),
+            )
+            for environment in self.__environments
+        ]
+
+        async with ClientSession(
+            connector=TCPConnector(limit=max_connections)
+        ) as session:
+            await gather(
+                *[
+                    generator.generate(
+                        session=session,
+                        response_cache=response_cache,
+                        scheduler=scheduler,
+                        shared_results=shared_results,
+                        metrics=metrics,
+                        language_colors=language_colors,
+                        history=history,
+                    )
+                    for generator, environment in zip(generators, self.__environments)
+                ]
+            )
+
+        if response_cache is not None:
+            response_cache.save()
+        for generator in generators:
+            generator.save()
+        save_run_report(metrics=metrics)
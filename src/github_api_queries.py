@@ -1,12 +1,16 @@
 #!/usr/bin/python3
 
-from requests import post, get, models
-from asyncio import Semaphore, sleep
-from aiohttp import ClientSession
+from asyncio import sleep, gather, wait, ensure_future, shield, Task, FIRST_COMPLETED
+from aiohttp import ClientSession, ClientError, ClientResponse
 from http import HTTPStatus
-from typing import Optional
-from json import loads
+from typing import Optional, Iterable, AsyncIterator, Callable
+from random import uniform
+from time import monotonic
+from json import dumps, loads
 
+from src.db.response_cache import ResponseCache
+from src.request_scheduler import RequestScheduler
+from src.run_metrics import RunMetrics
 
 ###############################################################################
 # GitHubApiQueries class
@@ -17,12 +21,67 @@ class GitHubApiQueries(object):
     """
     Class with functions to query the GitHub GraphQL (v4) API and the REST (v3)
     API. Also includes functions to dynamically generate GraphQL queries.
+    The queries of several accounts can share one request scheduler, and the
+    results of background-computed REST paths and of repo collaborators so
+    that those common to the accounts are only requested once. Every request is recorded in the run
+    metrics, which may be shared too.
     """
 
     __GITHUB_API_URL: str = "https://api.github.com/"
     __GRAPHQL_PATH: str = "graphql"
     __REST_QUERY_LIMIT: int = 60
+    __RATE_LIMIT_RETRIES: int = 5
+    __REPOS_BATCH_SIZE: int = 50
+    __SEARCH_QUERY_MAX_LEN: int = 256
+    __REPOS_PAGE_SIZE: int = 100
+    __REPO_FIELDS: str = """
+                            nameWithOwner
+                            stargazers {
+                                totalCount
+                            }
+                            forkCount
+                            isFork
+                            isEmpty
+                            isArchived
+                            isPrivate
+                            pushedAt
+                            viewerPermission
+                            languages(first: 20, orderBy: {
+                                field: SIZE,
+                                direction: DESC
+                            }) {
+                                edges {
+                                    size
+                                    node {
+                                        name
+                                        color
+                                    }
+                                }
+                            }"""
+    __REPO_COLLABORATORS_FIELDS: str = """
+                            collaborators(first: 100) {
+                                totalCount
+                                nodes {
+                                    login
+                                }
+                            }"""
+    __REPOS_PAGE_FIELDS: str = f"""
+                        pageInfo {{
+                            hasNextPage
+                            endCursor
+                        }}
+                        nodes {{
+                            {__REPO_FIELDS}
+                        }}"""
+    # top-level field every query selects, for the points the query costs
+    __RATE_LIMIT_FIELD: str = """
+                rateLimit {
+                    cost
+                }"""
     __ASYNCIO_SLEEP_TIME: int = 2
+    __ACCEPTED_BACKOFF_BASE: float = 1.0  # seconds
+    __ACCEPTED_BACKOFF_CAP: float = 30.0  # seconds
+    __ACCEPTED_DEADLINE: float = 300.0  # seconds
     __DEFAULT_MAX_CONNECTIONS: int = 10
 
     def __init__(
@@ -31,158 +90,724 @@ class GitHubApiQueries(object):
         access_token: str,
         session: ClientSession,
         max_connections: int = __DEFAULT_MAX_CONNECTIONS,
+        response_cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        shared_results: Optional[dict[str, Task]] = None,
+        api_url: Optional[str] = None,
+        metrics: Optional[RunMetrics] = None,
     ) -> None:
         self.username: str = username
         self.access_token: str = access_token
         self.session: ClientSession = session
-        self.semaphore: Semaphore = Semaphore(max_connections)
+        self.max_connections: int = max(1, max_connections)
+        self.scheduler: RequestScheduler = (
+            scheduler
+            if scheduler is not None
+            else RequestScheduler(max_connections=self.max_connections)
+        )
+        self.response_cache: Optional[ResponseCache] = response_cache
+        self.shared_results: Optional[dict[str, Task]] = shared_results
+        self.api_url: str = (api_url or self.__GITHUB_API_URL).rstrip("/") + "/"
+        self.metrics: RunMetrics = metrics if metrics is not None else RunMetrics()
         self.headers: dict[str, str] = {
             "Authorization": f"Bearer {self.access_token}",
         }
 
-    async def query(self, generated_query: str) -> dict[str, dict]:
+    async def query(
+        self, generated_query: str, endpoint: Optional[str] = None
+    ) -> dict[str, dict]:
         """
         Make a request to the GraphQL API using the authentication token from
         the environment
         :param generated_query: string query to be sent to the API
+        :param endpoint: name the request is recorded under in the run
+        metrics, or None to name it after the first field queried
         :return: decoded GraphQL JSON output
         """
-        try:
-            async with self.semaphore:
-                r_async = await self.session.post(
-                    url=self.__GITHUB_API_URL + self.__GRAPHQL_PATH,
-                    headers=self.headers,
-                    json={"query": generated_query},
-                )
-            result: dict[str, dict] = await r_async.json()
+        if endpoint is None:
+            endpoint = RunMetrics.graphql_endpoint(query=generated_query)
+        for i in range(self.__RATE_LIMIT_RETRIES):
+            if i > 0:
+                self.metrics.record_retry(endpoint=endpoint)
+            try:
+                async with self.scheduler.slot(
+                    resource=RequestScheduler.GRAPHQL, account=self.username
+                ) as slot:
+                    start: float = monotonic()
+                    r_async = await self.session.post(
+                        url=self.api_url + self.__GRAPHQL_PATH,
+                        headers=self.headers,
+                        json={"query": generated_query},
+                    )
+                    body: bytes = await r_async.read()
+                    try:
+                        result: Optional[dict[str, dict]] = loads(body)
+                    except ValueError:
+                        result = None
+                    self.__record_response(
+                        endpoint=endpoint,
+                        start=start,
+                        body=body,
+                        response=r_async,
+                        cost=self.__query_cost(result=result),
+                    )
+                    slot.record(status=r_async.status, headers=r_async.headers)
+                if slot.is_rate_limited:
+                    continue
 
-            if result is not None:
-                return result
-        except ConnectionError:
-            print("aiohttp failed for GraphQL query")
-
-            # Fall back on non-async requests
-            async with self.semaphore:
-                r_requests = post(
-                    url=self.__GITHUB_API_URL + self.__GRAPHQL_PATH,
-                    headers=self.headers,
-                    json={"query": generated_query},
-                )
-                result = r_requests.json()
+                if r_async.status >= HTTPStatus.INTERNAL_SERVER_ERROR.value:
+                    self.metrics.record_error(endpoint=endpoint)
+                    print(f"GraphQL query returned {r_async.status}. Retrying...")
+                    await sleep(self.__retry_delay(attempt=i))
+                    continue
 
-                if result is not None:
-                    return result
+                if result is None:
+                    print(f"GraphQL query returned {r_async.status} without JSON data")
+                    return dict()
+
+                if self.__is_secondary_rate_limited(result=result):
+                    self.scheduler.pause_secondary_rate_limit(
+                        resource=RequestScheduler.GRAPHQL, account=self.username
+                    )
+                    continue
+                if any(
+                    error.get("type") == "RATE_LIMITED"
+                    for error in (result or {}).get("errors", [])
+                ):
+                    # the scheduler holds further requests until the limit resets
+                    continue
+
+                return result
+            except (ClientError, TimeoutError):
+                self.metrics.record_error(endpoint=endpoint)
+                print("aiohttp failed for GraphQL query attempt #" + str(i + 1))
+                await sleep(self.__retry_delay(attempt=i))
         return dict()
 
+    def __record_response(
+        self,
+        endpoint: str,
+        start: float,
+        body: bytes,
+        response: ClientResponse,
+        cost: int = 1,
+    ) -> None:
+        self.metrics.record_response(
+            endpoint=endpoint,
+            latency=monotonic() - start,
+            size=len(body),
+            status=response.status,
+            headers=response.headers,
+            account=self.username,
+            cost=cost,
+        )
+
+    @staticmethod
+    def __query_cost(result: any) -> int:
+        """
+        :param result: decoded response to a GraphQL query
+        :return: rate limit points the query cost, as reported in its
+        rateLimit field, or 1 if not reported
+        """
+        if not isinstance(result, dict):
+            return 1
+        rate_limit: any = (result.get("data") or {}).get("rateLimit")
+        if not isinstance(rate_limit, dict) or not isinstance(
+            rate_limit.get("cost"), int
+        ):
+            return 1
+        return rate_limit["cost"]
+
+    @classmethod
+    def __retry_delay(cls, attempt: int, deadline: Optional[float] = None) -> float:
+        """
+        :param attempt: number of the failed attempt, starting from 0
+        :param deadline: monotonic time not to wait beyond, if any
+        :return: seconds to wait before retrying a request that failed to connect
+        """
+        delay: float = min(
+            cls.__ACCEPTED_BACKOFF_CAP, cls.__ASYNCIO_SLEEP_TIME * 2**attempt
+        )
+        if deadline is not None:
+            delay = max(0.0, min(delay, deadline - monotonic()))
+        return delay
+
+    @staticmethod
+    def __is_secondary_rate_limited(result: any) -> bool:
+        """
+        :param result: decoded JSON output of a request
+        :return: True if the request was rejected by a secondary rate limit
+        """
+        return isinstance(result, dict) and "secondary rate limit" in str(
+            result.get("message", "")
+        )
+
     async def query_rest(
-        self, path: str, params: Optional[dict] = None
-    ) -> dict[str, str | int | dict | list[dict[str, str]]] | list[dict[str, any]]:
+        self,
+        path: str,
+        params: Optional[dict] = None,
+        is_accepted_retried: bool = True,
+        is_cached: bool = True,
+        deadline: Optional[float] = None,
+    ) -> Optional[
+        dict[str, str | int | dict | list[dict[str, str]]] | list[dict[str, any]]
+    ]:
         """
-        Make a request to the REST API
+        Make a request to the REST API. Requests failing to connect or with a
+        server error are retried, other responses without a JSON body, such as
+        204 No Content, are final
         :param path: API path to query
         :param params: Query parameters to be passed to the API
-        :return: deserialized REST JSON output
+        :param is_accepted_retried: whether to retry a 202 Accepted response
+        :param is_cached: whether to use the response cache, if any
+        :param deadline: monotonic time after which the request is no longer
+        retried, or None for no limit other than the number of attempts
+        :return: deserialized REST JSON output, empty if there is none, or None
+        if the path returned 202 Accepted and is_accepted_retried is False
         """
-        for i in range(self.__REST_QUERY_LIMIT):
-            if params is None:
-                params = dict()
-            if path.startswith("/"):
-                path = path[1:]
+        if params is None:
+            params = dict()
+        if path.startswith("/"):
+            path = path[1:]
+        cache_key: str = ResponseCache.key(
+            url=self.api_url + path, params=params, account=self.username
+        )
+        response_cache: Optional[ResponseCache] = (
+            self.response_cache if is_cached else None
+        )
+        headers: dict[str, str] = self.headers
+        if response_cache is not None:
+            headers = {
+                **self.headers,
+                **response_cache.conditional_headers(key=cache_key),
+            }
 
+        endpoint: str = RunMetrics.rest_endpoint(path=path)
+        status: Optional[int] = None
+        for i in range(self.__REST_QUERY_LIMIT):
+            if deadline is not None and monotonic() > deadline:
+                break
+            if i > 0:
+                self.metrics.record_retry(endpoint=endpoint)
             try:
-                async with self.semaphore:
+                async with self.scheduler.slot(
+                    resource=RequestScheduler.REST, account=self.username
+                ) as slot:
+                    start: float = monotonic()
                     r_async = await self.session.get(
-                        self.__GITHUB_API_URL + path,
-                        headers=self.headers,
+                        self.api_url + path,
+                        headers=headers,
                         params=tuple(params.items()),
                     )
+                    body: bytes = await r_async.read()
+                    self.__record_response(
+                        endpoint=endpoint, start=start, body=body, response=r_async
+                    )
+                    slot.record(status=r_async.status, headers=r_async.headers)
+                if slot.is_rate_limited:
+                    continue
+                status = r_async.status
+
+                if (
+                    r_async.status == HTTPStatus.NOT_MODIFIED.value
+                    and response_cache is not None
+                ):
+                    cached: Optional[dict[str, any]] = response_cache.get(key=cache_key)
+                    if cached is not None:
+                        self.metrics.record_cache_hit(endpoint=endpoint)
+                        return cached.get("body")
+                    # entry evicted since the request was made: fetch in full
+                    headers = self.headers
+                    continue
 
                 if r_async.status == HTTPStatus.ACCEPTED.value:
+                    if not is_accepted_retried:
+                        return None
                     print(f"A path returned {HTTPStatus.ACCEPTED.value}. Retrying...")
                     await sleep(self.__ASYNCIO_SLEEP_TIME)
                     continue
 
-                result: dict[str, str | dict] = await r_async.json()
+                if r_async.status >= HTTPStatus.INTERNAL_SERVER_ERROR.value:
+                    self.metrics.record_error(endpoint=endpoint)
+                    print(f"{path} returned {r_async.status}. Retrying...")
+                    await sleep(self.__retry_delay(attempt=i, deadline=deadline))
+                    continue
+
+                try:
+                    result: Optional[dict[str, str | dict]] = loads(body)
+                except ValueError:
+                    result = None
+                if result is None:
+                    # e.g. 204 No Content for the statistics of an empty repo,
+                    # or a null body
+                    print(f"{path} returned {r_async.status} without JSON data")
+                    return dict()
 
-                if result is not None:
-                    return result
-            except ConnectionError:
+                if self.__is_secondary_rate_limited(result=result):
+                    self.scheduler.pause_secondary_rate_limit(
+                        resource=RequestScheduler.REST, account=self.username
+                    )
+                    continue
+
+                if response_cache is not None and r_async.status == HTTPStatus.OK.value:
+                    response_cache.put(
+                        key=cache_key,
+                        body=result,
+                        etag=r_async.headers.get("ETag"),
+                        last_modified=r_async.headers.get("Last-Modified"),
+                    )
+                return result
+            except (ClientError, TimeoutError):
+                self.metrics.record_error(endpoint=endpoint)
                 print("aiohttp failed for REST query attempt #" + str(i + 1))
+                await sleep(self.__retry_delay(attempt=i, deadline=deadline))
 
-                # Fall back on non-async requests
-                async with self.semaphore:
-                    r_requests = get(
-                        self.__GITHUB_API_URL + path,
-                        headers=self.headers,
-                        params=tuple(params.items()),
+        if status == HTTPStatus.ACCEPTED.value:
+            print(
+                f"Too many {HTTPStatus.ACCEPTED.value}s. Data for this repository will be incomplete."
+            )
+        else:
+            print(
+                f"Failed to get {path} (last status {status}). "
+                f"Data for this repository will be incomplete."
+            )
+        return dict()
+
+    def save_response_cache(self) -> None:
+        """
+        Persist the REST response cache, if used, for subsequent runs
+        """
+        if self.response_cache is not None:
+            self.response_cache.save()
+
+    async def query_rest_fan_out(
+        self, paths: Iterable[str], params: Optional[dict] = None
+    ) -> dict[
+        str, dict[str, str | int | dict | list[dict[str, str]]] | list[dict[str, any]]
+    ]:
+        """
+        Make a request to the REST API for each path concurrently, with no more
+        requests in flight than the configured maximum number of connections
+        :param paths: API paths to query
+        :param params: Query parameters to be passed to the API for each path
+        :return: deserialized REST JSON output for each path, keyed by path
+        """
+        pending: list[str] = list(dict.fromkeys(paths))
+        pending.reverse()
+        results: dict[
+            str,
+            dict[str, str | int | dict | list[dict[str, str]]] | list[dict[str, any]],
+        ] = dict()
+
+        async def worker() -> None:
+            while pending:
+                path: str = pending.pop()
+                results[path] = await self.query_rest(path=path, params=params)
+
+        await gather(
+            *[worker() for _ in range(min(self.max_connections, len(pending)))]
+        )
+        return results
+
+    async def query_rest_when_ready(
+        self,
+        paths: Iterable[str],
+        deadline: float = __ACCEPTED_DEADLINE,
+        is_cached: bool = True,
+    ) -> AsyncIterator[
+        tuple[
+            str,
+            dict[str, str | int | dict | list[dict[str, str]]] | list[dict[str, any]],
+        ]
+    ]:
+        """
+        Make a request to the REST API for each path whose result GitHub
+        computes in the background, such as /repos/{repo}/stats/contributors.
+        All paths are requested up front so that GitHub computes the results in
+        parallel. Paths answering 202 Accepted are then polled with exponential
+        backoff and jitter until ready or until the overall deadline passes.
+        Paths already requested for another account sharing results are not
+        requested again
+        :param paths: API paths to query
+        :param deadline: seconds to wait at most for all results to be ready
+        :param is_cached: whether to use the response cache, if any
+        :return: (path, deserialized REST JSON output) pairs as each is ready
+        """
+        end_time: float = monotonic() + deadline
+
+        async def poll(
+            path: str,
+        ) -> tuple[
+            str,
+            dict[str, str | int | dict | list[dict[str, str]]] | list[dict[str, any]],
+        ]:
+            attempt: int = 0
+            while True:
+                if attempt > 0:
+                    self.metrics.record_retry(endpoint=RunMetrics.rest_endpoint(path))
+                result: Optional[
+                    dict[str, str | int | dict | list[dict[str, str]]]
+                    | list[dict[str, any]]
+                ] = await self.query_rest(
+                    path=path,
+                    is_accepted_retried=False,
+                    is_cached=is_cached,
+                    deadline=end_time,
+                )
+                if result is not None:
+                    return path, result
+
+                delay: float = uniform(
+                    0,
+                    min(
+                        self.__ACCEPTED_BACKOFF_CAP,
+                        self.__ACCEPTED_BACKOFF_BASE * 2**attempt,
+                    ),
+                )
+                if monotonic() + delay > end_time:
+                    print(
+                        f"{path} is still being computed by GitHub. "
+                        f"Data for this repository will be incomplete."
                     )
+                    return path, dict()
+                await sleep(delay)
+                attempt += 1
+
+        async def shared_poll(
+            path: str,
+        ) -> tuple[
+            str,
+            dict[str, str | int | dict | list[dict[str, str]]] | list[dict[str, any]],
+        ]:
+            task: Optional[Task] = self.shared_results.get(path)
+            if task is None or task.cancelled():
+                task = self.shared_results[path] = ensure_future(poll(path))
+            # shield so that other accounts awaiting the task are not cancelled
+            return await shield(task)
+
+        pending: set[Task] = {
+            ensure_future(
+                poll(path) if self.shared_results is None else shared_poll(path)
+            )
+            for path in dict.fromkeys(paths)
+        }
+        try:
+            while pending:
+                # completed tasks are dropped once yielded, along with their
+                # decoded responses
+                done, pending = await wait(pending, return_when=FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def query_repos(
+        self,
+        repo_names: Iterable[str],
+        is_collaborators_only: bool = False,
+        is_shared: bool = False,
+    ) -> dict[str, dict]:
+        """
+        Fetch repositories by name from the GraphQL API, packing up to
+        __REPOS_BATCH_SIZE repositories into each query, with batches queried
+        concurrently
+        :param repo_names: names of the repos in owner/name format
+        :param is_collaborators_only: whether to only fetch the collaborators
+        of the repos, rather than the fields of the repos the statistics are
+        computed from
+        :param is_shared: whether the repos are the same for any account, so
+        that repos already requested for another account sharing results are
+        not requested again
+        :return: repository nodes keyed by the requested repo name, omitting
+        repos that could not be found
+        """
+        # sorted so that the same repos always make the same queries
+        repo_names = sorted(set(repo_names))
+        if not is_shared or self.shared_results is None:
+            return await self.__query_repos(
+                repo_names=repo_names, is_collaborators_only=is_collaborators_only
+            )
+
+        def shared_key(repo_name: str) -> str:
+            return (
+                f"graphql:{'collaborators' if is_collaborators_only else 'repo'}:"
+                f"{repo_name}"
+            )
+
+        missing: list[str] = []
+        for repo_name in repo_names:
+            task: Optional[Task] = self.shared_results.get(shared_key(repo_name))
+            if task is None or task.cancelled():
+                missing.append(repo_name)
+        if missing:
+            # the repos missing are requested together, each sharing the task
+            batch_task: Task = ensure_future(
+                self.__query_repos(
+                    repo_names=missing, is_collaborators_only=is_collaborators_only
+                )
+            )
+            for repo_name in missing:
+                self.shared_results[shared_key(repo_name)] = batch_task
 
-                    if r_requests.status_code == HTTPStatus.ACCEPTED.value:
-                        print(
-                            f"A path returned {HTTPStatus.ACCEPTED.value}. Retrying..."
-                        )
-                        await sleep(self.__ASYNCIO_SLEEP_TIME)
-                        continue
-                    elif r_requests.status_code == HTTPStatus.OK.value:
-                        return r_requests.json()
-
-        print(
-            f"Too many {HTTPStatus.ACCEPTED.value}s. Data for this repository will be incomplete."
+        repos: dict[str, dict] = dict()
+        for repo_name in repo_names:
+            # shield so that other accounts awaiting the task are not cancelled
+            shared: dict[str, dict] = await shield(
+                self.shared_results[shared_key(repo_name)]
+            )
+            if shared.get(repo_name):
+                repos[repo_name] = shared[repo_name]
+        return repos
+
+    async def __query_repos(
+        self, repo_names: list[str], is_collaborators_only: bool
+    ) -> dict[str, dict]:
+        """
+        :param repo_names: sorted names of the repos in owner/name format
+        :param is_collaborators_only: whether to only fetch the collaborators
+        :return: repository nodes keyed by repo name, omitting repos that
+        could not be found
+        """
+        batches: list[list[str]] = [
+            repo_names[i : i + self.__REPOS_BATCH_SIZE]
+            for i in range(0, len(repo_names), self.__REPOS_BATCH_SIZE)
+        ]
+        fields: str = (
+            self.__REPO_COLLABORATORS_FIELDS
+            if is_collaborators_only
+            else self.__REPO_FIELDS
         )
-        return dict()
+        results: list[dict[str, dict]] = await gather(
+            *[
+                self.query(
+                    generated_query=self.repos_by_name(repo_names=batch, fields=fields),
+                    endpoint=(
+                        "graphql:collaborators" if is_collaborators_only else None
+                    ),
+                )
+                for batch in batches
+            ]
+        )
+
+        repos: dict[str, dict] = dict()
+        for batch, result in zip(batches, results):
+            data: dict[str, dict] = (result or {}).get("data") or {}
+            for i, repo_name in enumerate(batch):
+                if data.get(f"repo{i}"):
+                    repos[repo_name] = data[f"repo{i}"]
+        return repos
+
+    async def query_page(
+        self,
+        generated_query: Callable[[Optional[str]], str],
+        connection: str,
+        cursor: Optional[str] = None,
+    ) -> tuple[dict[str, any], Optional[str]]:
+        """
+        Query a page of a connection of the viewer with the GraphQL API. Pages
+        are queried one at a time, so that connections paged through
+        concurrently are each only queried for as many pages as they have
+        :param generated_query: function generating the query of a page from
+        the end cursor of the previous page, None for the first page
+        :param connection: name of the connection of the viewer, e.g.
+        repositories
+        :param cursor: end cursor of the previous page, or None for the first
+        :return: the viewer of the page, and the end cursor to query the next
+        page with, or None if it is the last page
+        """
+        result: dict[str, dict] = await self.query(
+            generated_query=generated_query(cursor),
+            endpoint=f"graphql:{connection}",
+        )
+        viewer: dict[str, any] = ((result or {}).get("data") or {}).get("viewer") or {}
+
+        page_info: dict[str, any] = (viewer.get(connection) or {}).get("pageInfo") or {}
+        next_cursor: Optional[str] = page_info.get("endCursor")
+        if not page_info.get("hasNextPage") or next_cursor == cursor:
+            next_cursor = None
+        return viewer, next_cursor
+
+    async def search_issue_count(
+        self, search_query: str, repo_names: Optional[Iterable[str]] = None
+    ) -> int:
+        """
+        Count the issues and pull requests matching a search with the GraphQL
+        API. When restricted to repos, the repos are split across as many
+        searches as needed to keep within the search query length limit,
+        packing up to __REPOS_BATCH_SIZE searches into each query
+        :param search_query: GitHub search query, e.g. "involves:USER is:pr"
+        :param repo_names: names of the repos in owner/name format to restrict
+        the search to, or None to search all of GitHub
+        :return: total count of matching issues and pull requests
+        """
+        search_queries: list[str] = [search_query]
+        if repo_names is not None:
+            search_queries = []
+            for repo_name in sorted(set(repo_names)):
+                repo_qualifier: str = f" repo:{repo_name}"
+                if (
+                    search_queries
+                    and len(search_queries[-1] + repo_qualifier)
+                    <= self.__SEARCH_QUERY_MAX_LEN
+                ):
+                    search_queries[-1] += repo_qualifier
+                else:
+                    search_queries.append(search_query + repo_qualifier)
+
+        batches: list[list[str]] = [
+            search_queries[i : i + self.__REPOS_BATCH_SIZE]
+            for i in range(0, len(search_queries), self.__REPOS_BATCH_SIZE)
+        ]
+        results: list[dict[str, dict]] = await gather(
+            *[
+                self.query(generated_query=self.search_counts(search_queries=batch))
+                for batch in batches
+            ]
+        )
+
+        count: int = 0
+        for result in results:
+            data: dict[str, dict] = (result or {}).get("data") or {}
+            count += sum(
+                (search or {}).get("issueCount", 0) for search in data.values()
+            )
+        return count
+
+    @classmethod
+    def search_counts(cls, search_queries: list[str]) -> str:
+        """
+        :param search_queries: GitHub search queries for issues and pull requests
+        :return: GraphQL query for the number of results of each search, aliased
+        search0...searchN in the order given
+        """
+        searches: str = "\n".join(f"""
+                search{i}: search(type: ISSUE, query: {dumps(search_query)}, first: 1) {{
+                    issueCount
+                }}""" for i, search_query in enumerate(search_queries))
+        return f"""
+            query {{
+                {searches}
+                {cls.__RATE_LIMIT_FIELD}
+            }}"""
+
+    @classmethod
+    def repos_by_name(cls, repo_names: list[str], fields: Optional[str] = None) -> str:
+        """
+        :param repo_names: names of the repos in owner/name format
+        :param fields: fields to query of each repo, or None for those the
+        statistics are computed from
+        :return: GraphQL query for the repositories, aliased repo0...repoN in
+        the order given
+        """
+        by_name: str = "\n".join(
+            f"""
+                repo{i}: repository(owner: {dumps(owner)}, name: {dumps(name)}) {{
+                    {cls.__REPO_FIELDS if fields is None else fields}
+                }}"""
+            for i, (owner, _, name) in enumerate(
+                repo_name.partition("/") for repo_name in repo_names
+            )
+        )
+        return f"""
+            query {{
+                {by_name}
+                {cls.__RATE_LIMIT_FIELD}
+            }}"""
 
     @staticmethod
-    def repos_overview(
-        contrib_cursor: Optional[str] = None, owned_cursor: Optional[str] = None
+    def __cursor(cursor: Optional[str]) -> str:
+        """
+        :param cursor: end cursor of the previous page, or None
+        :return: the cursor as a GraphQL argument value
+        """
+        return "null" if cursor is None else dumps(cursor)
+
+    @classmethod
+    def __repos_filters(
+        cls,
+        is_fork: Optional[bool] = None,
+        is_archived: Optional[bool] = None,
+        privacy: Optional[str] = None,
+        owner_affiliations: Optional[Iterable[str]] = None,
+    ) -> str:
+        """
+        :return: the arguments of a repositories connection filtering the
+        repos server-side, for the filters given
+        """
+        filters: list[str] = []
+        if is_fork is not None:
+            filters.append(f"isFork: {dumps(is_fork)},")
+        if is_archived is not None:
+            filters.append(f"isArchived: {dumps(is_archived)},")
+        if privacy is not None:
+            filters.append(f"privacy: {privacy},")
+        if owner_affiliations is not None:
+            filters.append(f"ownerAffiliations: [{', '.join(owner_affiliations)}],")
+        return " ".join(filters)
+
+    @classmethod
+    def owned_repos_page(
+        cls,
+        cursor: Optional[str] = None,
+        is_fork: Optional[bool] = None,
+        is_archived: Optional[bool] = None,
+        privacy: Optional[str] = None,
+        owner_affiliations: Optional[Iterable[str]] = None,
     ) -> str:
         """
-        :return: GraphQL queries with overview of user repositories
+        :param cursor: end cursor of the previous page, or None for the first
+        :param is_fork: only forks if True, no forks if False, both if None
+        :param is_archived: only archived repos if True, none if False, both
+        if None
+        :param privacy: PUBLIC or PRIVATE to only get repos of that
+        visibility, or None for both
+        :param owner_affiliations: relations the user must have to the owner
+        of the repos, e.g. OWNER, or None for GitHub's default
+        :return: GraphQL query for a page of the user's repositories, with the
+        user's login and name
         """
+        filters: str = cls.__repos_filters(
+            is_fork=is_fork,
+            is_archived=is_archived,
+            privacy=privacy,
+            owner_affiliations=owner_affiliations,
+        )
         return f"""
             {{
                 viewer {{
                     login,
                     name,
                     repositories(
-                    first: 100,
+                    first: {cls.__REPOS_PAGE_SIZE},
                     orderBy: {{
                         field: UPDATED_AT,
                         direction: DESC
                     }},
-                    after: {
-        'null' if owned_cursor is None
-        else """ + owned_cursor + """
-        }) {{
-                        pageInfo {{
-                            hasNextPage
-                            endCursor
-                        }}
-                        nodes {{
-                            nameWithOwner
-                            stargazers {{
-                                totalCount
-                            }}
-                            forkCount
-                            isFork
-                            isEmpty
-                            isArchived
-                            isPrivate
-                            languages(first: 20, orderBy: {{
-                                field: SIZE,
-                                direction: DESC
-                            }}) {{
-                                edges {{
-                                    size
-                                    node {{
-                                        name
-                                        color
-                                    }}
-                                }}
-                            }}
-                        }}
+                    {filters}
+                    after: {cls.__cursor(cursor)}) {{
+                        {cls.__REPOS_PAGE_FIELDS}
                     }}
+                }}
+                {cls.__RATE_LIMIT_FIELD}
+            }}"""
+
+    @classmethod
+    def contributed_repos_page(
+        cls, cursor: Optional[str] = None, privacy: Optional[str] = None
+    ) -> str:
+        """
+        :param cursor: end cursor of the previous page, or None for the first
+        :param privacy: PUBLIC or PRIVATE to only get repos of that
+        visibility, or None for both
+        :return: GraphQL query for a page of the repositories the user
+        contributed to, other than their own
+        """
+        return f"""
+            {{
+                viewer {{
                     repositoriesContributedTo(
-                    first: 100,
+                    first: {cls.__REPOS_PAGE_SIZE},
                     includeUserRepositories: false,
                     orderBy: {{
                         field: UPDATED_AT,
@@ -193,57 +818,17 @@ class GitHubApiQueries(object):
                         PULL_REQUEST,
                         REPOSITORY,
                         PULL_REQUEST_REVIEW
-                    ]
-                    after: {
-        'null' if contrib_cursor is None
-        else """ + contrib_cursor + """}) {{
-                        pageInfo {{
-                            hasNextPage
-                            endCursor
-                        }}
-                        nodes {{
-                            nameWithOwner
-                            stargazers {{
-                                totalCount
-                            }}
-                            forkCount
-                            isFork
-                            isEmpty
-                            isArchived
-                            isPrivate
-                            languages(first: 20, orderBy: {{
-                                field: SIZE,
-                                direction: DESC
-                            }}) {{
-                                edges {{
-                                    size
-                                    node {{
-                                        name
-                                        color
-                                    }}
-                                }}
-                            }}
-                        }}
+                    ],
+                    {cls.__repos_filters(privacy=privacy)}
+                    after: {cls.__cursor(cursor)}) {{
+                        {cls.__REPOS_PAGE_FIELDS}
                     }}
                 }}
+                {cls.__RATE_LIMIT_FIELD}
             }}"""
 
     @staticmethod
-    def contributions_all_years() -> str:
-        """
-        :return: GraphQL query to get all years the user has been a contributor
-        """
-        return """
-            query {
-                viewer {
-                    contributionsCollection {
-                        contributionYears
-                    }
-                }
-            }"""
-
-    @staticmethod
-    def contributions_by_year(year: str) -> str:
+    def contributions_by_year(year: int | str) -> str:
         """
         :param year: year to query for
         :return: portion of a GraphQL query with desired info for a given year
@@ -259,22 +844,45 @@ class GitHubApiQueries(object):
             }}"""
 
     @classmethod
-    def all_contributions(cls, years: list[str]) -> str:
+    def all_contributions(cls, years: Iterable[int | str]) -> str:
         """
         :param years: list of years to get contributions for
-        :return: query to retrieve contribution information for all user years
+        :return: query to retrieve contribution information for the years
+        given, along with all years the user has been a contributor
         """
         by_years: str = "\n".join(map(cls.contributions_by_year, years))
         return f"""
             query {{
                 viewer {{
+                    contributionsCollection {{
+                        contributionYears
+                    }}
                     {by_years}
                 }}
+                {cls.__RATE_LIMIT_FIELD}
             }}"""
 
-    @staticmethod
-    def get_language_colors() -> dict[str, dict[str, str]]:
-        url: models.Response = get(
-            "https://raw.githubusercontent.com/ozh/github-colors/master/colors.json"
-        )
-        return loads(url.text)
+    async def get_language_colors(self) -> dict[str, dict[str, str]]:
+        """
+        :return: colors of languages as used by GitHub, keyed by language name,
+        or an empty dict if the table could not be fetched
+        """
+        endpoint: str = "language_colors"
+        try:
+            start: float = monotonic()
+            async with self.session.get(
+                "https://raw.githubusercontent.com/ozh/github-colors/master/colors.json"
+            ) as r_async:
+                body: bytes = await r_async.read()
+                self.__record_response(
+                    endpoint=endpoint, start=start, body=body, response=r_async
+                )
+                # served as text/plain, so skip the content type check
+                result: dict[str, dict[str, str]] = await r_async.json(
+                    content_type=None
+                )
+        except (ClientError, TimeoutError, ValueError):
+            self.metrics.record_error(endpoint=endpoint)
+            print("Failed to fetch language colors. Using the bundled colors")
+            return dict()
+        return result if isinstance(result, dict) else dict()
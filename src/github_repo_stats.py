@@ -1,11 +1,67 @@
 #!/usr/bin/python3
 
-from typing import Optional, cast
+from typing import Optional, Callable, Coroutine, Iterable, cast
+from asyncio import Task, ensure_future, gather, shield
 from aiohttp import ClientSession
-from datetime import date, timedelta
-
+from datetime import date, datetime, time, timedelta, timezone
+from functools import partial, wraps
+from time import monotonic
+
+from src.db.history import StatsHistory
+from src.db.language_colors import LanguageColors
+from src.db.repo_snapshots import RepoSnapshots
+from src.db.response_cache import ResponseCache
+from src.contributor_weeks import ContributorWeeks, RepoWeeks
 from src.env_vars import EnvironmentVariables
 from src.github_api_queries import GitHubApiQueries
+from src.profiling import TRACER
+from src.request_scheduler import RequestScheduler
+from src.run_metrics import RunMetrics
+
+###############################################################################
+# Helper Functions
+###############################################################################
+
+
+def single_flight(
+    func: Callable[..., Coroutine[any, any, any]],
+) -> Callable[..., Coroutine[any, any, any]]:
+    """
+    Memoize an argument-free coroutine method per instance so that all
+    awaiters, concurrent or later, share the one task computing its result.
+    A failed or cancelled computation is discarded so that it can be retried.
+    The time taken by each computation is recorded in the run metrics, and
+    as a span when profiling
+    """
+
+    async def timed(self) -> any:
+        start: float = monotonic()
+        try:
+            with TRACER.span(
+                name=func.__name__, category="stat", account=self.queries.username
+            ):
+                return await func(self)
+        finally:
+            self.queries.metrics.record_stat(
+                account=self.queries.username,
+                name=func.__name__,
+                seconds=monotonic() - start,
+            )
+
+    @wraps(func)
+    async def wrapper(self) -> any:
+        tasks: dict[str, Task] = self.__dict__.setdefault("_single_flight_tasks", {})
+        task: Optional[Task] = tasks.get(func.__name__)
+
+        if task is None or (
+            task.done() and (task.cancelled() or task.exception() is not None)
+        ):
+            task = tasks[func.__name__] = ensure_future(timed(self))
+        # shield so that one cancelled awaiter does not cancel the shared task
+        return await shield(task)
+
+    return wrapper
+
 
 ###############################################################################
 # GitHubRepoStats class
@@ -22,15 +78,74 @@ class GitHubRepoStats(object):
         "dependabot[bot]"
     ]  # exclude bot data from being included in statistical calculations
     _NO_NAME: str = "No Name"
+    # permissions without push access, with which GitHub denies traffic
+    __READ_ONLY_PERMISSIONS: set[str] = {"READ", "TRIAGE"}
+    # statistics each statistic is computed from, get_stats and
+    # total_contributions fetching from the API without depending on any
+    __STAT_DEPENDENCIES: dict[str, tuple[str, ...]] = {
+        "get_stats": (),
+        "total_contributions": (),
+        "name": ("get_stats",),
+        "stargazers": ("get_stats",),
+        "forks": ("get_stats",),
+        "languages": ("get_stats",),
+        "excluded_languages": ("get_stats",),
+        "languages_proportional": ("get_stats",),
+        "repos": ("get_stats",),
+        "owned_repos": ("get_stats",),
+        "raw_collaborators": ("repos",),
+        "lines_changed": ("repos", "raw_collaborators"),
+        "contributed_collab_repos": ("lines_changed",),
+        "avg_contribution_percent": ("lines_changed",),
+        "avg_contribution_percent_weighted": ("lines_changed",),
+        "contributors": ("lines_changed",),
+        "collaborators": ("raw_collaborators", "contributors"),
+        "views": ("repos",),
+        "views_from_date": ("views",),
+        "clones": ("views",),
+        "pull_requests": ("repos",),
+        "issues": ("repos",),
+    }
 
     def __init__(
-        self, environment_vars: EnvironmentVariables, session: ClientSession
+        self,
+        environment_vars: EnvironmentVariables,
+        session: ClientSession,
+        response_cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        shared_results: Optional[dict[str, Task]] = None,
+        history: Optional[StatsHistory] = None,
+        snapshots: Optional[RepoSnapshots] = None,
+        metrics: Optional[RunMetrics] = None,
+        language_colors: Optional[LanguageColors] = None,
     ) -> None:
         self.environment_vars: EnvironmentVariables = environment_vars
+        if response_cache is None and self.environment_vars.response_cache_size_mb > 0:
+            response_cache = ResponseCache(
+                max_size=self.environment_vars.response_cache_size_mb * 1024 * 1024
+            )
         self.queries: GitHubApiQueries = GitHubApiQueries(
             username=self.environment_vars.username,
             access_token=self.environment_vars.access_token,
             session=session,
+            max_connections=self.environment_vars.max_connections,
+            response_cache=response_cache,
+            scheduler=scheduler,
+            shared_results=shared_results,
+            api_url=self.environment_vars.api_url,
+            metrics=metrics,
+        )
+
+        self.__language_colors: LanguageColors = (
+            language_colors if language_colors is not None else LanguageColors()
+        )
+        self.__snapshots: RepoSnapshots = (
+            snapshots
+            if snapshots is not None
+            else RepoSnapshots(username=self.environment_vars.username)
+        )
+        self.__history: StatsHistory = (
+            history if history is not None else StatsHistory()
         )
 
         self._name: Optional[str] = None
@@ -53,9 +168,12 @@ class GitHubRepoStats(object):
         self._pull_requests: Optional[int] = None
         self._issues: Optional[int] = None
         self._empty_repos: Optional[set[str]] = None
+        self._repos_pushed_at: Optional[dict[str, Optional[str]]] = None
+        self._private_repos: Optional[set[str]] = None
+        self._read_only_repos: Optional[set[str]] = None
+        self._clones: Optional[int] = None
         self._collab_repos: Optional[set[str]] = None
         self._contributed_collab_repos: Optional[set[str]] = None
-        self._is_fetch_rate_limit_exceeded: Optional[bool] = False
 
     async def to_str(self) -> str:
         """
@@ -90,6 +208,50 @@ class GitHubRepoStats(object):
         Total number of languages: {len(list(languages.keys()))} (+{len(await self.excluded_languages):,})
         Languages:\n\t\t\t- {formatted_languages}"""
 
+    @classmethod
+    def required_stats(cls, stats: Iterable[str]) -> list[str]:
+        """
+        :param stats: names of the statistics wanted
+        :return: names of the statistics needed to compute them, each after
+        the statistics it depends on
+        """
+        required: dict[str, None] = dict()
+
+        def require(stat: str) -> None:
+            if stat in required:
+                return
+            dependencies: Optional[tuple[str, ...]] = cls.__STAT_DEPENDENCIES.get(stat)
+            if dependencies is None:
+                raise ValueError(f"Unknown statistic {stat}")
+            for dependency in dependencies:
+                require(stat=dependency)
+            required[stat] = None
+
+        for stat in stats:
+            require(stat=stat)
+        return list(required)
+
+    async def compute(self, stats: Iterable[str]) -> dict[str, any]:
+        """
+        Compute the statistics given and only what they depend on. All of
+        them are started at once, each waiting only for the statistics it
+        depends on, so that independent ones, such as views and
+        lines_changed, are fetched concurrently
+        :param stats: names of the statistics wanted
+        :return: value of each statistic wanted
+        """
+        stats: list[str] = list(stats)
+        required: list[str] = self.required_stats(stats=stats)
+
+        def start(stat: str) -> Coroutine:
+            value: any = getattr(self, stat)
+            return value() if callable(value) else value
+
+        values: dict[str, any] = dict(
+            zip(required, await gather(*(start(stat=stat) for stat in required)))
+        )
+        return {stat: values[stat] for stat in stats}
+
     async def is_repo_name_invalid(self, repo_name: str) -> bool:
         """
         Determines a repo name invalid if:
@@ -126,9 +288,10 @@ class GitHubRepoStats(object):
             or self.environment_vars.is_exclude_private_repos
             and (repo_data.get("isPrivate") or repo_data.get("private"))
             or self.environment_vars.is_exclude_public_repos
-            and (not repo_data.get("isPrivate") or not repo_data.get("private"))
+            and not (repo_data.get("isPrivate") or repo_data.get("private"))
         )
 
+    @single_flight
     async def get_stats(self) -> None:
         """
         Get lots of summary stats using one big query. Sets many attributes
@@ -140,64 +303,86 @@ class GitHubRepoStats(object):
         self._languages: dict[str, dict[str, float | str]] = dict()
         self._repos: set[str] = set()
         self._empty_repos: set[str] = set()
-
-        next_owned: str | None = None
-        next_contrib: str | None = None
-
-        while True:
-            raw_results: dict[str, dict] = await self.queries.query(
-                generated_query=GitHubApiQueries.repos_overview(
-                    owned_cursor=next_owned, contrib_cursor=next_contrib
-                )
-            )
-            raw_results = raw_results if raw_results is not None else {}
-
-            if not self._name:
-                self._name = (
-                    raw_results.get("data", {}).get("viewer", {}).get("name", None)
-                )
-                if self._name is None:
-                    self._name = (
-                        raw_results.get("data", {})
-                        .get("viewer", {})
-                        .get("login", self._NO_NAME)
+        self._repos_pushed_at: dict[str, Optional[str]] = dict()
+        self._private_repos: set[str] = set()
+        self._read_only_repos: set[str] = set()
+
+        async def stream_pages(
+            connection: str, generated_query: Callable[[Optional[str]], str]
+        ) -> None:
+            cursor: Optional[str] = None
+            page: int = 0
+            while page == 0 or cursor is not None:
+                page += 1
+                # the span includes the request, to show it next to the others
+                with TRACER.span(
+                    name="get_stats page",
+                    category="page",
+                    account=self.environment_vars.username,
+                    connection=connection,
+                    page=page,
+                ):
+                    viewer, cursor = await self.queries.query_page(
+                        generated_query=generated_query,
+                        connection=connection,
+                        cursor=cursor,
+                    )
+                    if connection == "repositories" and not self._name:
+                        self._name = viewer.get("name") or viewer.get(
+                            "login", self._NO_NAME
+                        )
+                    await self.repo_stats(
+                        repos=(viewer.get(connection) or {}).get("nodes") or []
                     )
-            print("name", self._name)
-
-            owned_repos: dict[str, dict | list[dict]] = (
-                raw_results.get("data", {}).get("viewer", {}).get("repositories", {})
-            )
-            repos: list[dict] = owned_repos.get("nodes", [])
-            contrib_repos: dict[str, dict | list] = (
-                raw_results.get("data", {})
-                .get("viewer", {})
-                .get("repositoriesContributedTo", {})
-            )
-
-            if not self.environment_vars.is_exclude_contrib_repos:
-                repos += contrib_repos.get("nodes", [])
-
-            await self.repo_stats(repos=repos)
 
-            is_cur_owned: bool = owned_repos.get("pageInfo", {}).get(
-                "hasNextPage", False
-            )
-            is_cur_contrib: bool = contrib_repos.get("pageInfo", {}).get(
-                "hasNextPage", False
+        # the repo types excluded are filtered out server-side where GitHub
+        # supports it, is_repo_type_excluded() filtering out the rest
+        privacy: Optional[str] = None
+        if self.environment_vars.is_exclude_private_repos:
+            if not self.environment_vars.is_exclude_public_repos:
+                privacy = "PUBLIC"
+        elif self.environment_vars.is_exclude_public_repos:
+            privacy = "PRIVATE"
+
+        # owned and contributed repos are paged through concurrently, each
+        # page processed as soon as it is received
+        paginators: list[Coroutine] = [
+            stream_pages(
+                connection="repositories",
+                generated_query=partial(
+                    GitHubApiQueries.owned_repos_page,
+                    is_fork=(
+                        None if self.environment_vars.is_include_forked_repos else False
+                    ),
+                    is_archived=(
+                        False
+                        if self.environment_vars.is_exclude_archive_repos
+                        else None
+                    ),
+                    privacy=privacy,
+                    # GitHub's default, kept when excluding the repos contributed
+                    # to, which only leaves out repositoriesContributedTo
+                    owner_affiliations=["OWNER", "COLLABORATOR"],
+                ),
             )
-
-            if is_cur_owned or is_cur_contrib:
-                next_owned = owned_repos.get("pageInfo", {}).get(
-                    "endCursor", next_owned
-                )
-                next_contrib = contrib_repos.get("pageInfo", {}).get(
-                    "endCursor", next_contrib
+        ]
+        if not self.environment_vars.is_exclude_contrib_repos:
+            paginators.append(
+                stream_pages(
+                    connection="repositoriesContributedTo",
+                    generated_query=partial(
+                        GitHubApiQueries.contributed_repos_page, privacy=privacy
+                    ),
                 )
-            else:
-                break
+            )
+        await gather(*paginators)
 
         await self.manually_added_repo_stats()
 
+        for lang_name, language in self._languages.items():
+            if language.get("color") is None:
+                language["color"] = await self.__language_color(lang_name=lang_name)
+
         for lang_name in self._exclude_repo_languages:
             if (
                 lang_name not in self._languages.keys()
@@ -239,6 +424,11 @@ class GitHubRepoStats(object):
             if await self.is_repo_name_invalid(repo_name):
                 continue
             self._repos.add(repo_name)
+            self._repos_pushed_at[repo_name] = repo.get("pushedAt")
+            if repo.get("isPrivate"):
+                self._private_repos.add(repo_name)
+            if repo.get("viewerPermission") in self.__READ_ONLY_PERMISSIONS:
+                self._read_only_repos.add(repo_name)
 
             self._stargazers += repo.get("stargazers").get("totalCount", 0)
             self._forks += repo.get("forkCount", 0)
@@ -249,7 +439,7 @@ class GitHubRepoStats(object):
 
             for lang in repo.get("languages", {}).get("edges", []):
                 lang_name: str = lang.get("node", {}).get("name", "Other")
-                languages: dict[str, dict[str, float | str]] = await self.languages
+                languages: dict[str, dict[str, float | str]] = self._languages
 
                 if self.__exclude_repo_langs(
                     repo_name=repo_name, lang_name=lang_name, languages=languages
@@ -260,9 +450,15 @@ class GitHubRepoStats(object):
                     self._excluded_languages.add(lang_name)
                     continue
 
+                # nothing is awaited while updating the languages, as the
+                # pages of owned and contributed repos are processed
+                # concurrently: missing colors are resolved by get_stats
                 if lang_name in languages:
                     languages[lang_name]["size"] += lang.get("size", 0)
                     languages[lang_name]["occurrences"] += 1
+                    languages[lang_name]["color"] = languages[lang_name].get(
+                        "color"
+                    ) or lang.get("node", {}).get("color")
                 else:
                     languages[lang_name] = {
                         "size": lang.get("size", 0),
@@ -274,136 +470,119 @@ class GitHubRepoStats(object):
         """
         Gathers statistical data from fetches for manually added repos otherwise not fetched by user association
         """
-        lang_cols: dict[str, dict[str, str]] = self.queries.get_language_colors()
+        repo_names: list[str] = [
+            repo_name
+            for repo_name in self.environment_vars.manually_added_repos
+            if not await self.is_repo_name_invalid(repo_name=repo_name)
+        ]
+        repos: dict[str, dict] = await self.queries.query_repos(repo_names=repo_names)
+        await self.repo_stats(repos=list(repos.values()))
+
+    def __history_key(self, repo: str) -> str:
+        """
+        :param repo: the name of the repo in owner/name format
+        :return: key of the repo in the stats history
+        """
+        return StatsHistory.repo_key(
+            repo=repo,
+            is_private=self._private_repos is not None and repo in self._private_repos,
+        )
 
-        for repo_name in self.environment_vars.manually_added_repos:
-            if await self.is_repo_name_invalid(repo_name=repo_name):
-                continue
-            self._repos.add(repo_name)
+    def save_history(self) -> None:
+        """
+        Write the stats history recorded in this run to disk
+        """
+        self.__history.commit()
 
-            repo_stats: dict[str, str | int | dict] = await self.queries.query_rest(
-                path=f"/repos/{repo_name}"
+    async def __language_color(self, lang_name: str) -> Optional[str]:
+        """
+        :param lang_name: name of the language as used by GitHub
+        :return: hex color of the language, or None if not known
+        """
+        color: Optional[str] = self.__language_colors.get(language=lang_name)
+        if color is None:
+            await self.__language_colors.refresh(
+                language_colors=self.queries.get_language_colors
             )
-            if await self.is_repo_type_excluded(repo_data=repo_stats):
-                continue
-
-            self._stargazers += repo_stats.get("stargazers_count", 0)
-            self._forks += repo_stats.get("forks", 0)
-
-            if repo_stats.get("size") == 0:
-                self._empty_repos.add(repo_name)
-                continue
-
-            if repo_stats.get("language"):
-                langs: dict[str, int] = await self.queries.query_rest(
-                    path=f"/repos/{repo_name}/languages"
-                )
-
-                for lang_name, size in langs.items():
-                    languages: dict[str, dict[str, float | str]] = await self.languages
-
-                    if self.__exclude_repo_langs(
-                        repo_name=repo_name, lang_name=lang_name, languages=languages
-                    ):
-                        continue
-
-                    if lang_name in self.environment_vars.exclude_langs:
-                        self._excluded_languages.add(lang_name)
-                        continue
-
-                    if lang_name in languages:
-                        languages[lang_name]["size"] += size
-                        languages[lang_name]["occurrences"] += 1
-                    else:
-                        languages[lang_name] = {
-                            "size": size,
-                            "occurrences": 1,
-                            "color": lang_cols.get(lang_name).get("color"),
-                        }
+            color = self.__language_colors.get(language=lang_name)
+        return color
 
     @property
+    @single_flight
     async def name(self) -> str:
         """
         :return: GitHub user's name
         """
-        if self._name is not None:
-            return self._name
         await self.get_stats()
         assert self._name is not None
         return self._name
 
     @property
+    @single_flight
     async def stargazers(self) -> int:
         """
         :return: total number of stargazers on user's repos
         """
-        if self._stargazers is not None:
-            return self._stargazers
         await self.get_stats()
         assert self._stargazers is not None
         return self._stargazers
 
     @property
+    @single_flight
     async def forks(self) -> int:
         """
         :return: total number of forks on user's repos
         """
-        if self._forks is not None:
-            return self._forks
         await self.get_stats()
         assert self._forks is not None
         return self._forks
 
     @property
+    @single_flight
     async def languages(self) -> dict[str, dict[str, float | str]]:
         """
         :return: summary of languages used by the user
         """
-        if self._languages is not None:
-            return self._languages
         await self.get_stats()
         assert self._languages is not None
         return self._languages
 
     @property
+    @single_flight
     async def excluded_languages(self) -> set[str]:
         """
         :return: summary of languages used by the user
         """
-        if self._excluded_languages is not None:
-            return self._excluded_languages
         await self.get_stats()
         assert self._excluded_languages is not None
         return self._excluded_languages
 
     @property
+    @single_flight
     async def languages_proportional(self) -> dict[str, float]:
         """
         :return: summary of languages used by the user, with proportional usage
         """
-        if self._languages is None:
-            await self.get_stats()
-            assert self._languages is not None
+        await self.get_stats()
+        assert self._languages is not None
         return {k: v.get("prop", 0) for (k, v) in self._languages.items()}
 
     @property
+    @single_flight
     async def repos(self) -> set[str]:
         """
         :return: list of names of repos user is involved with
         """
-        if self._repos is not None:
-            return self._repos
         await self.get_stats()
         assert self._repos is not None
         return self._repos
 
     @property
+    @single_flight
     async def owned_repos(self) -> set[str]:
         """
         :return: list of names of repos owned by user
         """
-        if self._owned_repos is not None:
-            return self._owned_repos
         await self.get_stats()
         assert self._repos is not None
         self._owned_repos: set[str] = set(
@@ -416,56 +595,126 @@ class GitHubRepoStats(object):
         return self._owned_repos
 
     @property
+    @single_flight
     async def contributed_collab_repos(self) -> set[str]:
         """
         :return: list of names of repos contributed to user in collaborations with at least one other
         """
-        if self._contributed_collab_repos is not None:
-            return self._contributed_collab_repos
         await self.lines_changed
         assert self._contributed_collab_repos is not None
         return self._contributed_collab_repos
 
     @property
+    @single_flight
     async def total_contributions(self) -> int:
         """
         :return: count of user's total contributions as defined by GitHub
         """
         if self._total_contributions is not None:
             return self._total_contributions
-        self._total_contributions: int = 0
 
-        years: list[str] = (
-            (
-                await self.queries.query(
-                    generated_query=GitHubApiQueries.contributions_all_years()
+        # the totals of past years no longer change, so only the years since
+        # the last one stored are queried, along with the years the user has
+        # been a contributor, to find any other year not stored yet
+        current_year: int = datetime.now(tz=timezone.utc).year
+        totals: dict[int, int] = self.__history.contribution_years(
+            account=self.environment_vars.username
+        )
+        years: list[int] = list(
+            range(max(totals, default=current_year - 1) + 1, current_year + 1)
+        )
+        queried: set[int] = set()
+
+        while years:
+            queried.update(years)
+            viewer: dict[str, any] = (
+                (
+                    await self.queries.query(
+                        generated_query=GitHubApiQueries.all_contributions(years=years),
+                        endpoint="graphql:contributionYears",
+                    )
                 )
+                .get("data", {})
+                .get("viewer", {})
+            ) or {}
+            fetched: dict[int, int] = {
+                year: by_year.get("contributionCalendar", {}).get(
+                    "totalContributions", 0
+                )
+                for year in years
+                if isinstance(by_year := viewer.get(f"year{year}"), dict)
+            }
+            totals.update(fetched)
+            self.__history.upsert_contribution_years(
+                account=self.environment_vars.username,
+                years=[
+                    (year, total)
+                    for year, total in fetched.items()
+                    if year < current_year
+                ],
             )
-            .get("data", {})
-            .get("viewer", {})
-            .get("contributionsCollection", {})
-            .get("contributionYears", [])
-        )
 
-        by_year: list[dict[str, dict[str, int]]] = list(
-            (
-                await self.queries.query(
-                    generated_query=GitHubApiQueries.all_contributions(years=years)
+            # years not stored yet, such as all of them on the first run, are
+            # queried with a second request
+            years = [
+                year
+                for year in (viewer.get("contributionsCollection") or {}).get(
+                    "contributionYears", []
                 )
-            )
-            .get("data", {})
-            .get("viewer", {})
-            .values()
+                if year not in totals and year not in queried
+            ]
+
+        self._total_contributions: int = sum(totals.values())
+        return cast(typ=int, val=self._total_contributions)
+
+    def __is_other_author(self, author: str) -> bool:
+        """
+        :param author: login of an author of a repo
+        :return: True if the author's changes are counted as those of another
+        author than the user
+        """
+        return (
+            author != self.environment_vars.username
+            and author not in self._EXCLUDED_USER_NAMES
         )
 
-        for year in by_year:
-            self._total_contributions += year.get("contributionCalendar", {}).get(
-                "totalContributions", 0
-            )
+    def __aggregate_contributors(
+        self, contributor_weeks: ContributorWeeks
+    ) -> dict[str, int | list[str]]:
+        """
+        :param contributor_weeks: contributor statistics of a repo from the
+        REST API
+        :return: lines changed by the user and by other authors in the repo,
+        with the authors who contributed to it
+        """
+        contributor_set: set[str] = set(contributor_weeks.authors)
+        repo_contributors: set[str] = set()
+        repo_contributors.add(self.environment_vars.username)
+        other_authors_total_changes: int = 0
+        author_additions: int = 0
+        author_deletions: int = 0
+
+        for (author, additions, deletions), week_count in zip(
+            contributor_weeks.author_totals(), contributor_weeks.week_counts()
+        ):
+            if self.__is_other_author(author=author):
+                other_authors_total_changes += additions + deletions
+                if week_count > 0:
+                    repo_contributors.add(author)
+            else:
+                author_additions += additions
+                author_deletions += deletions
 
-        return cast(typ=int, val=self._total_contributions)
+        return {
+            "contributors": sorted(contributor_set),
+            "repo_contributors": sorted(repo_contributors),
+            "other_authors_total_changes": other_authors_total_changes,
+            "author_additions": author_additions,
+            "author_deletions": author_deletions,
+        }
 
     @property
+    @single_flight
     async def lines_changed(self) -> tuple[int, int]:
         """
         Fetches total lines added and deleted for user and repository total
@@ -475,7 +724,6 @@ class GitHubRepoStats(object):
         """
         if self._users_lines_changed is not None:
             return self._users_lines_changed
-        _, collab_repos = await self.raw_collaborators()
         slave_status_repos: set[str] = self.environment_vars.more_collab_repos
         exclusive_collab_repos: set[str] = (
             self.environment_vars.only_included_collab_repos
@@ -488,46 +736,74 @@ class GitHubRepoStats(object):
         author_total_additions: int = 0
         author_total_deletions: int = 0
 
-        self._contributed_collab_repos: set[str] = collab_repos.copy().union(
-            slave_status_repos.copy()
+        repo_aggregates: dict[str, dict[str, int | list[str]]] = dict()
+        repo_weeks: list[tuple[str, bytes, bytes, bytes, bytes]] = []
+        contributors_paths: dict[str, str] = dict()
+        stored_weeks: set[str] = self.__history.repo_weeks_keys(
+            account=self.environment_vars.username
         )
 
         for repo in await self.repos:
             if repo in self._empty_repos:
                 continue
-            repo_contributors: set[str] = set()
-            repo_contributors.add(self.environment_vars.username)
-            other_authors_total_changes: int = 0
-            author_additions: int = 0
-            author_deletions: int = 0
-
-            r: list[dict[str, any]] = await self.queries.query_rest(
-                path=f"/repos/{repo}/stats/contributors"
+            snapshot: Optional[dict[str, int | list[str]]] = self.__snapshots.get(
+                repo=repo, pushed_at=self._repos_pushed_at.get(repo)
+            )
+            # repos snapshotted before their weeks were stored are fetched again
+            if snapshot is not None and self.__history_key(repo) in stored_weeks:
+                repo_aggregates[repo] = snapshot
+            else:
+                contributors_paths[f"/repos/{repo}/stats/contributors"] = repo
+
+        # only repos pushed to since their last snapshot are fetched again, so
+        # their statistics have changed and are not worth keeping in the
+        # response cache: only their aggregates are kept
+        async for path, r in self.queries.query_rest_when_ready(
+            paths=contributors_paths.keys(), is_cached=False
+        ):
+            repo: str = contributors_paths[path]
+            contributor_weeks: ContributorWeeks = ContributorWeeks.from_response(
+                contributors=r
+            )
+            repo_aggregates[repo] = self.__aggregate_contributors(
+                contributor_weeks=contributor_weeks
             )
 
-            for author_obj in r:
-                # Handle malformed response from API by skipping this repo
-                if not isinstance(author_obj, dict) or not isinstance(
-                    author_obj.get("author", {}), dict
-                ):
-                    continue
-                author: str = author_obj.get("author", {}).get("login", "")
-                contributor_set.add(
-                    author
-                )  # for count number of total other contributors
-
-                if (
-                    author != self.environment_vars.username
-                    and author not in self._EXCLUDED_USER_NAMES
-                ):
-                    for week in author_obj.get("weeks", []):
-                        other_authors_total_changes += week.get("a", 0)
-                        other_authors_total_changes += week.get("d", 0)
-                        repo_contributors.add(author)
-                else:
-                    for week in author_obj.get("weeks", []):
-                        author_additions += week.get("a", 0)
-                        author_deletions += week.get("d", 0)
+            if isinstance(r, list) and r:
+                self.__snapshots.set(
+                    repo=repo,
+                    pushed_at=self._repos_pushed_at.get(repo),
+                    aggregate=repo_aggregates[repo],
+                )
+                repo_weeks.append(
+                    (
+                        self.__history_key(repo=repo),
+                        *contributor_weeks.repo_weeks(
+                            is_user=[
+                                not self.__is_other_author(author=author)
+                                for author in contributor_weeks.authors
+                            ]
+                        ).to_columns(),
+                    )
+                )
+        self.__snapshots.save()
+        self.__history.upsert_repo_weeks(
+            account=self.environment_vars.username, repo_weeks=repo_weeks
+        )
+
+        # the collaborators are only waited for now, so that they are queried
+        # while the contributor statistics are fetched when both are computed
+        _, collab_repos = await self.raw_collaborators()
+        self._contributed_collab_repos: set[str] = collab_repos.copy().union(
+            slave_status_repos.copy()
+        )
+
+        for repo, aggregate in repo_aggregates.items():
+            contributor_set.update(aggregate["contributors"])
+            repo_contributors: set[str] = set(aggregate["repo_contributors"])
+            other_authors_total_changes: int = aggregate["other_authors_total_changes"]
+            author_additions: int = aggregate["author_additions"]
+            author_deletions: int = aggregate["author_deletions"]
             author_total_additions += author_additions
             author_total_deletions += author_deletions
 
@@ -589,29 +865,99 @@ class GitHubRepoStats(object):
         )
         return self._users_lines_changed
 
+    async def __weekly_changes_between(
+        self, start: date, end: date
+    ) -> list[tuple[int, int, int]]:
+        """
+        :param start: first day of the range
+        :param end: day after the last day of the range
+        :return: lines added and deleted by the user, and lines changed by the
+        other authors, in each repo in the weeks starting in the range
+        """
+        # the weeks of repos pushed to since the last run are stored first
+        await self.lines_changed
+        start_time: int = int(
+            datetime.combine(start, time(), tzinfo=timezone.utc).timestamp()
+        )
+        end_time: int = int(
+            datetime.combine(end, time(), tzinfo=timezone.utc).timestamp()
+        )
+        return [
+            RepoWeeks.from_columns(*columns).totals(start=start_time, end=end_time)
+            for columns in self.__history.repo_weeks(
+                account=self.environment_vars.username,
+                repos={
+                    self.__history_key(repo=repo)
+                    for repo in await self.repos
+                    if repo not in self._empty_repos
+                },
+            ).values()
+        ]
+
+    async def lines_changed_between(self, start: date, end: date) -> tuple[int, int]:
+        """
+        Sums the weekly changes stored by lines_changed, without any request
+        :param start: first day of the range, e.g. the first day of a year or
+        the day N weeks ago
+        :param end: day after the last day of the range
+        :return: count of lines added and deleted by the user in the weeks
+        starting in the range
+        """
+        changes: list[tuple[int, int, int]] = await self.__weekly_changes_between(
+            start=start, end=end
+        )
+        return (
+            sum(additions for additions, _, _ in changes),
+            sum(deletions for _, deletions, _ in changes),
+        )
+
+    async def contribution_share_between(
+        self, start: date, end: date
+    ) -> Optional[float]:
+        """
+        Sums the weekly changes stored by lines_changed, without any request
+        :param start: first day of the range
+        :param end: day after the last day of the range
+        :return: share of the lines changed in the weeks starting in the range
+        that were changed by the user, over the repos the user changed lines
+        in, or None if the user changed none
+        """
+        changes: list[tuple[int, int, int]] = [
+            repo_changes
+            for repo_changes in await self.__weekly_changes_between(
+                start=start, end=end
+            )
+            if repo_changes[0] + repo_changes[1] > 0
+        ]
+        if not changes:
+            return None
+        user_changes: int = sum(
+            additions + deletions for additions, deletions, _ in changes
+        )
+        return user_changes / (user_changes + sum(other for _, _, other in changes))
+
     @property
+    @single_flight
     async def avg_contribution_percent(self) -> str:
         """
         :return: str representing the avg percent of user's repo contributions
         """
-        if self._avg_percent is not None:
-            return self._avg_percent
         await self.lines_changed
         assert self._avg_percent is not None
         return self._avg_percent
 
     @property
+    @single_flight
     async def avg_contribution_percent_weighted(self) -> str:
         """
         :return: str representing the avg percent of user's repo contributions weighted by number of contributors
         """
-        if self._avg_percent_weighted is not None:
-            return self._avg_percent_weighted
         await self.lines_changed
         assert self._avg_percent_weighted is not None
         return self._avg_percent_weighted
 
     @property
+    @single_flight
     async def views(self) -> int:
         """
         Note: API returns a user's repository view data for the last 14 days.
@@ -626,23 +972,99 @@ class GitHubRepoStats(object):
         yesterday: str = (date.today() - timedelta(1)).strftime(
             format=self._DATE_FORMAT
         )
-        dates: set[str] = {last_viewed, yesterday}
 
-        today_view_count: int = 0
-        for repo in await self.repos:
-            r: dict[str, str | list[dict[str, str]]] = await self.queries.query_rest(
-                path=f"/repos/{repo}/traffic/views"
+        # traffic is only available with push access, so repos without it
+        # are not requested, their clones fetched along with the views when
+        # included
+        traffic_repos: list[str] = [
+            repo for repo in await self.repos if repo not in self._read_only_repos
+        ]
+        views_paths: dict[str, str] = {
+            f"/repos/{repo}/traffic/views": repo for repo in traffic_repos
+        }
+        clones_paths: dict[str, str] = (
+            {f"/repos/{repo}/traffic/clones": repo for repo in traffic_repos}
+            if self.environment_vars.is_include_repo_clones
+            else {}
+        )
+        repos_traffic: dict[str, dict[str, str | list[dict[str, str]]]] = (
+            await self.queries.query_rest_fan_out(
+                paths=[*views_paths.keys(), *clones_paths.keys()]
             )
+        )
 
-            for view in r.get("views", []):
-                if view.get("timestamp")[:10] == today:
-                    today_view_count += view.get("count", 0)
-                elif view.get("timestamp")[:10] > last_viewed:
-                    self.environment_vars.set_views(views=view.get("count", 0))
-                    dates.add(view.get("timestamp")[:10])
+        def traffic_days(
+            paths: dict[str, str], kind: str
+        ) -> list[tuple[str, str, int, int]]:
+            return [
+                (
+                    self.__history_key(repo=paths[path]),
+                    day.get("timestamp", "")[:10],
+                    day.get("count", 0),
+                    day.get("uniques", 0),
+                )
+                for path in paths
+                if isinstance(r := repos_traffic.get(path), dict)
+                for day in r.get(kind, [])
+                if day.get("timestamp")
+            ]
 
+        # views are stored by (repo, day), so a day reported again by later runs
+        # replaces its earlier count instead of being counted twice
+        self.__history.upsert_views(
+            account=self.environment_vars.username,
+            views=traffic_days(paths=views_paths, kind="views"),
+        )
+        self.__history.upsert_clones(
+            account=self.environment_vars.username,
+            clones=traffic_days(paths=clones_paths, kind="clones"),
+        )
+        # only the repos counted in this run, not those since excluded,
+        # renamed or no longer pushable
+        traffic_keys: list[str] = [
+            self.__history_key(repo=repo) for repo in traffic_repos
+        ]
+        if self.environment_vars.is_include_repo_clones:
+            self._clones: int = self.__history.clones_total(
+                account=self.environment_vars.username,
+                repos=traffic_keys,
+                after="0000-00-00",
+                until=today,
+            )
+
+        # only the views of the days still reported by the API are counted when
+        # the view count is not stored
+        counted_after: str = (
+            last_viewed
+            if self.environment_vars.is_store_repo_view_count
+            else (date.today() - timedelta(15)).strftime(format=self._DATE_FORMAT)
+        )
+        self.environment_vars.set_views(
+            views=self.__history.views_total(
+                account=self.environment_vars.username,
+                repos=traffic_keys,
+                after=counted_after,
+                until=yesterday,
+            )
+        )
+        today_view_count: int = self.__history.views_total(
+            account=self.environment_vars.username,
+            repos=traffic_keys,
+            after=yesterday,
+            until=today,
+        )
+
+        dates: set[str] = {last_viewed, yesterday}
         if last_viewed == "0000-00-00":
             dates.remove(last_viewed)
+        first_views_day: Optional[str] = self.__history.first_views_day(
+            account=self.environment_vars.username,
+            repos=traffic_keys,
+            after=counted_after,
+            until=yesterday,
+        )
+        if first_views_day is not None:
+            dates.add(first_views_day)
 
         if self.environment_vars.is_store_repo_view_count:
             self.environment_vars.set_last_viewed(new_last_viewed_date=yesterday)
@@ -660,40 +1082,56 @@ class GitHubRepoStats(object):
         return self._views
 
     @property
+    @single_flight
     async def views_from_date(self) -> str:
         """
         :return: the first date included in the repo view count
         """
-        if self._views_from_date is not None:
-            return self._views_from_date
         await self.views
         assert self._views_from_date is not None
         return self._views_from_date
 
-    async def raw_collaborators(self) -> tuple[set[str], set[str]]:
-        if self._collaborator_set is not None and self._collab_repos is not None:
-            return self._collaborator_set, self._collab_repos
+    @property
+    @single_flight
+    async def clones(self) -> Optional[int]:
+        """
+        :return: clone count of user's repositories since clones were first
+        included, or None if they are not included
+        """
+        await self.views
+        return self._clones
 
+    @single_flight
+    async def raw_collaborators(self) -> tuple[set[str], set[str]]:
         self._collaborator_set: set[str] = set()
         self._collab_repos: set[str] = set()
 
-        for repo in await self.repos:
-            r: list[dict[str, any]] = await self.queries.query_rest(
-                path=f"/repos/{repo}/collaborators"
+        # GitHub only lists collaborators to those with push access, who are
+        # all shown the same ones, so the repos are shared with other accounts
+        repos: dict[str, dict] = await self.queries.query_repos(
+            repo_names=[
+                repo for repo in await self.repos if repo not in self._read_only_repos
+            ],
+            is_collaborators_only=True,
+            is_shared=True,
+        )
+
+        for repo, repo_data in repos.items():
+            collaborators: dict[str, int | list[dict[str, str]]] = (
+                repo_data.get("collaborators") or {}
             )
-            collab_count: int = 0
 
-            for obj in r:
+            for obj in collaborators.get("nodes") or []:
                 if isinstance(obj, dict):
-                    collab_count += 1
                     self._collaborator_set.add(obj.get("login"))
 
-                    if collab_count > 1:
-                        self._collab_repos.add(repo)
+            if collaborators.get("totalCount", 0) > 1:
+                self._collab_repos.add(repo)
 
         return self._collaborator_set, self._collab_repos
 
     @property
+    @single_flight
     async def collaborators(self) -> int:
         """
         :return: count of total collaborators to user's repositories
@@ -711,17 +1149,17 @@ class GitHubRepoStats(object):
         return self._collaborators
 
     @property
+    @single_flight
     async def contributors(self) -> set[str]:
         """
         :return: count of total contributors to user's repositories
         """
-        if self._contributors is not None:
-            return self._contributors
         await self.lines_changed
         assert self._contributors is not None
         return self._contributors
 
     @property
+    @single_flight
     async def pull_requests(self) -> int:
         """
         :return: count of pull requests in repos user has either created, reviewed, commented, been assigned...
@@ -729,37 +1167,21 @@ class GitHubRepoStats(object):
         if self._pull_requests is not None:
             return self._pull_requests
 
-        pull_requests: set[str] = set()
-
-        if not self._is_fetch_rate_limit_exceeded:
-            for repo in await self.repos:
-                end_point: str = (
-                    f"/repos/{repo}/pulls?state=all&involved={self.environment_vars.username}"
-                )
-
-                for pr_data in await self.queries.query_rest(path=end_point):
-                    try:
-                        (
-                            pull_requests.add(pr_data["url"])
-                            if "url" in pr_data.keys()
-                            else None
-                        )
-                    except AttributeError:
-                        self._is_fetch_rate_limit_exceeded = True
-                        break
-
-                if self._is_fetch_rate_limit_exceeded:
-                    break
+        pull_requests: int = await self.queries.search_issue_count(
+            search_query=f"involves:{self.environment_vars.username} is:pr",
+            repo_names=await self.repos,
+        )
 
         self._pull_requests: int = (
-            len(pull_requests)
-            if len(pull_requests) > self.environment_vars.pull_requests_count
+            pull_requests
+            if pull_requests > self.environment_vars.pull_requests_count
             else self.environment_vars.pull_requests_count
         )
         self.environment_vars.set_pull_requests(pull_requests_count=self._pull_requests)
         return self._pull_requests
 
     @property
+    @single_flight
     async def issues(self) -> int:
         """
         :return: count of issues in repos user has either created, reacted to, commented, been assigned...
@@ -767,31 +1189,14 @@ class GitHubRepoStats(object):
         if self._issues is not None:
             return self._issues
 
-        issues: set[str] = set()
-
-        if not self._is_fetch_rate_limit_exceeded:
-            for repo in await self.repos:
-                end_point: str = (
-                    f"/repos/{repo}/issues?state=all&involved={self.environment_vars.username}"
-                )
-
-                for issue_data in await self.queries.query_rest(path=end_point):
-                    try:
-                        (
-                            issues.add(issue_data["url"])
-                            if "url" in issue_data.keys()
-                            else None
-                        )
-                    except AttributeError:
-                        self._is_fetch_rate_limit_exceeded = True
-                        break
-
-                if self._is_fetch_rate_limit_exceeded:
-                    break
+        issues: int = await self.queries.search_issue_count(
+            search_query=f"involves:{self.environment_vars.username} is:issue",
+            repo_names=await self.repos,
+        )
 
         self._issues: int = (
-            len(issues)
-            if len(issues) > self.environment_vars.issues_count
+            issues
+            if issues > self.environment_vars.issues_count
             else self.environment_vars.issues_count
         )
         self.environment_vars.set_issues(issues_count=self._issues)
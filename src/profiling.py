@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+from asyncio import Task, current_task
+from contextlib import contextmanager
+from json import dump
+from os import getpid, makedirs, replace
+from os.path import abspath, dirname
+from time import perf_counter
+from typing import Iterator, Optional
+
+###############################################################################
+# Tracer class
+###############################################################################
+
+
+class Tracer:
+    """
+    Records named spans of the work of a run as trace events, in the JSON
+    format of the Chrome trace viewer, Perfetto and speedscope. Spans of each
+    asyncio task are laid out on a lane of their own, so that the timeline
+    shows how concurrent work overlaps. Spans are only recorded once started,
+    costing next to nothing otherwise
+    """
+
+    __MAIN_LANE: int = 0
+
+    def __init__(self) -> None:
+        self.__events: Optional[list[dict[str, any]]] = None
+        self.__origin: float = 0.0
+        self.__lanes: dict[int, int] = dict()
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.__events is not None
+
+    def start(self) -> None:
+        """
+        Start recording spans, discarding any recorded before
+        """
+        self.__events = []
+        self.__origin = perf_counter()
+        self.__lanes = dict()
+
+    def __lane(self, name: str) -> int:
+        try:
+            task: Optional[Task] = current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            return self.__MAIN_LANE
+
+        lane: Optional[int] = self.__lanes.get(id(task))
+        if lane is None:
+            lane = self.__lanes[id(task)] = len(self.__lanes) + 1
+            # lanes are named after the first span of their task
+            self.__events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": getpid(),
+                    "tid": lane,
+                    "args": {"name": name},
+                }
+            )
+        return lane
+
+    @contextmanager
+    def span(self, name: str, category: str, **args: any) -> Iterator[None]:
+        """
+        Record the time spent in the block as a span
+        :param name: name of the span
+        :param category: category of the span, e.g. "stat" or "image"
+        :param args: details shown with the span
+        """
+        if self.__events is None:
+            yield
+            return
+
+        lane: int = self.__lane(name=name)
+        start: float = perf_counter()
+        try:
+            yield
+        finally:
+            self.__events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": (start - self.__origin) * 1e6,
+                    "dur": (perf_counter() - start) * 1e6,
+                    "pid": getpid(),
+                    "tid": lane,
+                    "args": args,
+                }
+            )
+
+    def save(self, file_path: str) -> None:
+        """
+        Write the spans recorded so far as a trace event JSON file
+        :param file_path: path to the trace file
+        """
+        makedirs(dirname(abspath(file_path)), exist_ok=True)
+        tmp_file_path: str = file_path + ".tmp"
+        with open(tmp_file_path, "w") as trace:
+            dump(
+                obj={
+                    "traceEvents": [
+                        {
+                            "name": "thread_name",
+                            "ph": "M",
+                            "pid": getpid(),
+                            "tid": self.__MAIN_LANE,
+                            "args": {"name": "main"},
+                        },
+                        *(self.__events or []),
+                    ],
+                    "displayTimeUnit": "ms",
+                },
+                fp=trace,
+            )
+        replace(tmp_file_path, file_path)
+
+
+# spans of the run, recorded once started
+TRACER: Tracer = Tracer()
@@ -0,0 +1,248 @@
+#!/usr/bin/python3
+
+from asyncio import sleep
+from gzip import open as open_gzip
+from json import dumps, loads
+from multidict import CIMultiDict, CIMultiDictProxy
+from os import makedirs, replace
+from os.path import abspath, dirname
+from time import monotonic
+from typing import Awaitable, Generator, Optional
+from urllib.parse import urlsplit
+
+from aiohttp import ClientResponse, ClientSession
+
+###############################################################################
+# Helper Functions
+###############################################################################
+
+# response headers the queries depend on, the only ones archived
+ARCHIVED_HEADERS: tuple[str, ...] = (
+    "ETag",
+    "Last-Modified",
+    "Retry-After",
+    "X-RateLimit-Limit",
+    "X-RateLimit-Remaining",
+    "X-RateLimit-Reset",
+    "X-RateLimit-Resource",
+)
+
+
+def exchange_key(method: str, url: str, **kwargs) -> str:
+    """
+    :param method: HTTP method of the request
+    :param url: URL of the request
+    :param kwargs: other arguments of the request, as given to ClientSession
+    :return: key identifying the request in an archive, independent of the
+    access token it is made with and of the host it is sent to, so that runs
+    against a mock API can replay recordings of GitHub and vice versa
+    """
+    headers: dict[str, str] = kwargs.get("headers") or {}
+    params: list[list[str]] = [
+        [str(k), str(v)]
+        for k, v in (
+            kwargs.get("params").items()
+            if isinstance(kwargs.get("params"), dict)
+            else kwargs.get("params") or ()
+        )
+    ]
+    return dumps(
+        [
+            method,
+            urlsplit(url).path,
+            params,
+            kwargs.get("json"),
+            "If-None-Match" in headers or "If-Modified-Since" in headers,
+        ],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+
+
+###############################################################################
+# ArchivedResponse class
+###############################################################################
+
+
+class ArchivedResponse:
+    """
+    Response replayed from an archive, with the parts of the aiohttp
+    ClientResponse interface used by the queries
+    """
+
+    def __init__(self, status: int, headers: dict[str, str], body: str) -> None:
+        self.status: int = status
+        self.headers: CIMultiDictProxy = CIMultiDictProxy(CIMultiDict(headers))
+        self.__body: str = body
+
+    async def read(self) -> bytes:
+        return self.__body.encode()
+
+    async def text(self) -> str:
+        return self.__body
+
+    async def json(self, **_) -> any:
+        return loads(self.__body) if self.__body else None
+
+    def release(self) -> None:
+        pass
+
+
+###############################################################################
+# ArchivedRequest class
+###############################################################################
+
+
+class ArchivedRequest:
+    """
+    Request that can be awaited or used as an async context manager, as the
+    requests of an aiohttp ClientSession
+    """
+
+    def __init__(self, response: Awaitable) -> None:
+        self.__response: Awaitable = response
+
+    def __await__(self) -> Generator:
+        return self.__response.__await__()
+
+    async def __aenter__(self) -> ClientResponse | ArchivedResponse:
+        return await self.__response
+
+    async def __aexit__(self, *_) -> None:
+        pass
+
+
+###############################################################################
+# RecordingSession class
+###############################################################################
+
+
+class RecordingSession:
+    """
+    Wraps a ClientSession to record every exchange made through it, with its
+    latency, to a gzipped JSON archive that ReplaySession can replay. Request
+    headers, including the access token, are not recorded, but responses are
+    recorded as is and may contain private data
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        archive_path: str,
+        exchanges: Optional[list[dict[str, any]]] = None,
+    ) -> None:
+        """
+        :param session: session to make the requests with
+        :param archive_path: path to write the archive to
+        :param exchanges: exchanges recorded by earlier sessions, to record
+        several runs into the same archive
+        """
+        self.__session: ClientSession = session
+        self.__archive_path: str = archive_path
+        self.__exchanges: list[dict[str, any]] = (
+            exchanges if exchanges is not None else []
+        )
+        self.requests: int = 0
+
+    def get(self, url: str, **kwargs) -> ArchivedRequest:
+        return ArchivedRequest(self.__record(method="GET", url=url, **kwargs))
+
+    def post(self, url: str, **kwargs) -> ArchivedRequest:
+        return ArchivedRequest(self.__record(method="POST", url=url, **kwargs))
+
+    async def __record(self, method: str, url: str, **kwargs) -> ClientResponse:
+        self.requests += 1
+        start: float = monotonic()
+        response: ClientResponse = await self.__session.request(
+            method=method, url=url, **kwargs
+        )
+        # read the body while timing, it is kept by the response for the caller
+        body: str = await response.text()
+
+        self.__exchanges.append(
+            {
+                "key": exchange_key(method, url, **kwargs),
+                "status": response.status,
+                "headers": {
+                    header: response.headers[header]
+                    for header in ARCHIVED_HEADERS
+                    if header in response.headers
+                },
+                "body": body,
+                "latency": round(monotonic() - start, 4),
+            }
+        )
+        return response
+
+    def save(self) -> None:
+        """
+        Write all exchanges recorded so far to the archive
+        """
+        makedirs(dirname(abspath(self.__archive_path)), exist_ok=True)
+        tmp_file_path: str = self.__archive_path + ".tmp"
+        with open_gzip(tmp_file_path, "wt") as archive:
+            archive.write(
+                dumps(
+                    obj={"version": 1, "exchanges": self.__exchanges},
+                    separators=(",", ":"),
+                )
+            )
+        replace(tmp_file_path, self.__archive_path)
+
+
+###############################################################################
+# ReplaySession class
+###############################################################################
+
+
+class ReplaySession:
+    """
+    Stands in for a ClientSession by replaying the exchanges of an archive
+    recorded by RecordingSession, without any network access. Responses to
+    the same request are replayed in the order recorded, the last repeating
+    once exhausted, as for requests polled until GitHub computed their result
+    """
+
+    def __init__(self, archive_path: str, is_latency_simulated: bool = False) -> None:
+        """
+        :param archive_path: path to the archive to replay
+        :param is_latency_simulated: whether to delay each response by its
+        recorded latency
+        """
+        self.__is_latency_simulated: bool = is_latency_simulated
+        self.__responses: dict[str, list[dict[str, any]]] = dict()
+        self.requests: int = 0
+        self.missing: int = 0
+
+        with open_gzip(archive_path, "rt") as archive:
+            for exchange in loads(archive.read()).get("exchanges", []):
+                self.__responses.setdefault(exchange["key"], []).append(exchange)
+
+    def get(self, url: str, **kwargs) -> ArchivedRequest:
+        return ArchivedRequest(self.__replay(method="GET", url=url, **kwargs))
+
+    def post(self, url: str, **kwargs) -> ArchivedRequest:
+        return ArchivedRequest(self.__replay(method="POST", url=url, **kwargs))
+
+    async def __replay(self, method: str, url: str, **kwargs) -> ArchivedResponse:
+        self.requests += 1
+        responses: Optional[list[dict[str, any]]] = self.__responses.get(
+            exchange_key(method, url, **kwargs)
+        )
+        if not responses:
+            self.missing += 1
+            print(f"No recorded response to {method} {url}")
+            return ArchivedResponse(
+                status=404, headers={}, body=dumps({"message": "Not Found"})
+            )
+
+        exchange: dict[str, any] = (
+            responses.pop(0) if len(responses) > 1 else responses[0]
+        )
+        if self.__is_latency_simulated:
+            await sleep(exchange.get("latency", 0))
+        return ArchivedResponse(
+            status=exchange["status"],
+            headers=exchange.get("headers", {}),
+            body=exchange.get("body", ""),
+        )
@@ -0,0 +1,250 @@
+#!/usr/bin/python3
+
+from asyncio import Condition, sleep
+from contextlib import asynccontextmanager
+from http import HTTPStatus
+from time import monotonic, time
+from typing import AsyncIterator, Mapping, Optional
+
+###############################################################################
+# RequestSlot class
+###############################################################################
+
+
+class RequestSlot:
+    """
+    A scheduled request, used to report the response back to the scheduler
+    """
+
+    def __init__(self) -> None:
+        self.status: Optional[int] = None
+        self.headers: Mapping[str, str] = dict()
+        self.is_error: bool = False
+        self.is_rate_limited: bool = False
+
+    def record(self, status: int, headers: Mapping[str, str]) -> None:
+        """
+        :param status: HTTP status code of the response
+        :param headers: headers of the response
+        """
+        self.status = status
+        self.headers = headers
+
+
+###############################################################################
+# RequestScheduler class
+###############################################################################
+
+
+class RequestScheduler:
+    """
+    Schedules requests to the GitHub APIs so that large fan-outs run as fast
+    as the rate limits allow without exhausting them:
+        - tracks the remaining rate limit budget of the REST and GraphQL APIs
+          separately from the X-RateLimit-* response headers
+        - paces requests evenly over the rest of the rate limit window once
+          the remaining budget runs low, and pauses when it is exhausted
+        - pauses for the Retry-After period of secondary rate limit responses
+        - keeps the budgets of each account apart, so that one scheduler, and
+          its concurrency limit, can be shared by requests of several accounts
+        - adapts the number of concurrent requests, up to max_connections,
+          increasing it while latency is steady and decreasing it when
+          latency climbs or requests fail
+    """
+
+    REST: str = "core"
+    GRAPHQL: str = "graphql"
+
+    __LOW_BUDGET_RATIO: float = 0.1
+    __SECONDARY_RATE_LIMIT_WAIT: int = 60
+    __LATENCY_TOLERANCE: float = 2.0
+    __LATENCY_SMOOTHING: float = 0.2
+    __LATENCY_FLOOR: float = 0.05  # seconds
+    __MIN_REPORTED_WAIT: float = 1.0
+
+    def __init__(self, max_connections: int) -> None:
+        self.max_connections: int = max(1, max_connections)
+        self.concurrency: int = self.max_connections
+
+        self.__condition: Condition = Condition()
+        self.__in_flight: int = 0
+        self.__in_flight_by_budget: dict[tuple[str, str], int] = dict()
+        self.__remaining: dict[tuple[str, str], int] = dict()
+        self.__limit: dict[tuple[str, str], int] = dict()
+        self.__reset: dict[tuple[str, str], float] = dict()
+        self.__paused_until: dict[tuple[str, str], float] = dict()
+        self.__last_started: dict[tuple[str, str], float] = dict()
+        self.__latency: Optional[float] = None
+        self.__successes: int = 0
+
+    @asynccontextmanager
+    async def slot(
+        self, resource: str, account: str = ""
+    ) -> AsyncIterator[RequestSlot]:
+        """
+        Wait until a request to the given API can be made, then hold a
+        concurrency slot for it. The response should be recorded on the
+        yielded slot, which reports whether it was rate limited on exit
+        :param resource: rate limit resource: RequestScheduler.REST or .GRAPHQL
+        :param account: account the request is made with
+        """
+        budget: tuple[str, str] = (account, resource)
+        await self.__acquire(budget=budget)
+        request_slot: RequestSlot = RequestSlot()
+        start: float = monotonic()
+
+        try:
+            yield request_slot
+        except BaseException:
+            request_slot.is_error = True
+            raise
+        finally:
+            await self.__release(
+                budget=budget, slot=request_slot, latency=monotonic() - start
+            )
+
+    def pause(self, resource: str, seconds: float, account: str = "") -> None:
+        """
+        Pause all requests to the given API
+        :param resource: rate limit resource: RequestScheduler.REST or .GRAPHQL
+        :param seconds: duration of the pause
+        :param account: account whose requests are paused
+        """
+        budget: tuple[str, str] = (account, resource)
+        self.__paused_until[budget] = max(
+            self.__paused_until.get(budget, 0), time() + seconds
+        )
+        self.concurrency = max(1, self.concurrency // 2)
+
+    def pause_secondary_rate_limit(self, resource: str, account: str = "") -> None:
+        """
+        Pause all requests to the given API after hitting a secondary rate
+        limit that did not specify how long to wait
+        :param resource: rate limit resource: RequestScheduler.REST or .GRAPHQL
+        :param account: account whose requests are paused
+        """
+        self.pause(
+            resource=resource,
+            seconds=self.__SECONDARY_RATE_LIMIT_WAIT,
+            account=account,
+        )
+
+    def __wait_time(self, budget: tuple[str, str]) -> float:
+        now: float = time()
+
+        paused: float = self.__paused_until.get(budget, 0) - now
+        if paused > 0:
+            return paused
+
+        if budget not in self.__remaining:
+            return 0
+
+        reset_in: float = self.__reset[budget] - now
+        if reset_in <= 0:
+            return 0
+
+        available: int = self.__remaining[budget] - self.__in_flight_by_budget.get(
+            budget, 0
+        )
+        if available <= 0:
+            return reset_in + 1
+
+        if available < self.__limit[budget] * self.__LOW_BUDGET_RATIO:
+            # spread the remaining budget evenly over the rest of the window
+            interval: float = reset_in / available
+            return max(0.0, self.__last_started.get(budget, 0) + interval - now)
+        return 0
+
+    async def __acquire(self, budget: tuple[str, str]) -> None:
+        account, resource = budget
+        while True:
+            wait: float = self.__wait_time(budget=budget)
+            if wait > 0:
+                if wait >= self.__MIN_REPORTED_WAIT:
+                    print(
+                        f"Approaching the {resource} API rate limit"
+                        f"{f' of {account}' if account else ''}. "
+                        f"Pausing for {wait:0.0f}s..."
+                    )
+                await sleep(wait)
+                continue
+
+            async with self.__condition:
+                await self.__condition.wait_for(
+                    lambda: self.__in_flight < self.concurrency
+                )
+                # the budget may have changed while waiting for a free slot
+                if self.__wait_time(budget=budget) > 0:
+                    continue
+
+                self.__in_flight += 1
+                self.__in_flight_by_budget[budget] = (
+                    self.__in_flight_by_budget.get(budget, 0) + 1
+                )
+                self.__last_started[budget] = time()
+                return
+
+    async def __release(
+        self, budget: tuple[str, str], slot: RequestSlot, latency: float
+    ) -> None:
+        self.__update_budget(budget=budget, headers=slot.headers)
+
+        if slot.status in (
+            HTTPStatus.FORBIDDEN.value,
+            HTTPStatus.TOO_MANY_REQUESTS.value,
+        ) and (
+            "Retry-After" in slot.headers
+            or slot.headers.get("X-RateLimit-Remaining") == "0"
+        ):
+            slot.is_rate_limited = True
+            try:
+                retry_after: int = int(slot.headers.get("Retry-After", 0))
+            except ValueError:
+                retry_after = self.__SECONDARY_RATE_LIMIT_WAIT
+            self.pause(resource=budget[1], seconds=retry_after, account=budget[0])
+        elif slot.is_error or (
+            slot.status is not None
+            and slot.status >= HTTPStatus.INTERNAL_SERVER_ERROR.value
+        ):
+            self.concurrency = max(1, self.concurrency // 2)
+            self.__successes = 0
+        else:
+            self.__adapt_to_latency(latency=latency)
+
+        async with self.__condition:
+            self.__in_flight -= 1
+            self.__in_flight_by_budget[budget] -= 1
+            self.__condition.notify_all()
+
+    def __update_budget(
+        self, budget: tuple[str, str], headers: Mapping[str, str]
+    ) -> None:
+        try:
+            remaining: int = int(headers["X-RateLimit-Remaining"])
+            limit: int = int(headers["X-RateLimit-Limit"])
+            reset: float = float(headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+
+        self.__remaining[budget] = remaining
+        self.__limit[budget] = limit
+        self.__reset[budget] = reset
+
+    def __adapt_to_latency(self, latency: float) -> None:
+        if self.__latency is None:
+            self.__latency = latency
+
+        if (
+            latency
+            > max(self.__latency, self.__LATENCY_FLOOR) * self.__LATENCY_TOLERANCE
+        ):
+            self.concurrency = max(1, self.concurrency - 1)
+            self.__successes = 0
+        else:
+            # increase by one slot per round of successful requests at this level
+            self.__successes += 1
+            if self.__successes >= self.concurrency:
+                self.concurrency = min(self.max_connections, self.concurrency + 1)
+                self.__successes = 0
+
+        self.__latency += self.__LATENCY_SMOOTHING * (latency - self.__latency)
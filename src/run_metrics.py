@@ -0,0 +1,334 @@
+#!/usr/bin/python3
+
+from http import HTTPStatus
+from json import dumps
+from os import makedirs, replace
+from os.path import abspath, dirname
+from re import Pattern, compile
+from time import monotonic, time
+from typing import Mapping, Optional
+
+###############################################################################
+# EndpointMetrics class
+###############################################################################
+
+
+class EndpointMetrics:
+    """
+    Counters and latency histogram of the requests made to one endpoint
+    """
+
+    LATENCY_BUCKETS: tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self) -> None:
+        self.requests: int = 0
+        self.retries: int = 0
+        self.accepted: int = 0
+        self.cache_hits: int = 0
+        self.errors: int = 0
+        self.bytes: int = 0
+        self.rate_limit_cost: int = 0
+        self.latency_sum: float = 0.0
+        # requests per latency bucket, the last one for latencies above all
+        self.latency_counts: list[int] = [0] * (len(self.LATENCY_BUCKETS) + 1)
+
+    def observe_latency(self, latency: float) -> None:
+        """
+        :param latency: seconds the request took, until its body was read
+        """
+        self.latency_sum += latency
+        for i, bound in enumerate(self.LATENCY_BUCKETS):
+            if latency <= bound:
+                self.latency_counts[i] += 1
+                return
+        self.latency_counts[-1] += 1
+
+    def to_dict(self) -> dict[str, any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "accepted": self.accepted,
+            "cache_hits": self.cache_hits,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "rate_limit_cost": self.rate_limit_cost,
+            "latency_sum": round(self.latency_sum, 4),
+            "latency_histogram": {
+                **{
+                    str(bound): count
+                    for bound, count in zip(self.LATENCY_BUCKETS, self.latency_counts)
+                },
+                "+Inf": self.latency_counts[-1],
+            },
+        }
+
+
+###############################################################################
+# RunMetrics class
+###############################################################################
+
+
+class RunMetrics:
+    """
+    Collects the metrics of a run: requests to the GitHub APIs per endpoint
+    template, such as /repos/{repo}/stats/contributors, the time taken by each
+    statistic of each account, and the rate limit budgets left. The metrics
+    can be written as a JSON report and as a Prometheus textfile
+    """
+
+    __GRAPHQL_FIELD: Pattern = compile(r"{\s*([A-Za-z_]+?)\d*[\s:({]")
+    __PROMETHEUS_PREFIX: str = "github_stats"
+
+    def __init__(self) -> None:
+        self.__started_at: float = time()
+        self.__start: float = monotonic()
+        self.__endpoints: dict[str, EndpointMetrics] = dict()
+        self.__stats: dict[str, dict[str, float]] = dict()
+        self.__rate_limits: dict[str, dict[str, dict[str, int]]] = dict()
+
+    @staticmethod
+    def rest_endpoint(path: str) -> str:
+        """
+        :param path: REST API path, e.g. repos/owner/name/stats/contributors
+        :return: the path with the repo replaced by a placeholder, e.g.
+        /repos/{repo}/stats/contributors
+        """
+        parts: list[str] = path.strip("/").split("/")
+        if parts[0] == "repos" and len(parts) >= 3:
+            parts[1:3] = ["{repo}"]
+        return "/" + "/".join(parts)
+
+    @classmethod
+    def graphql_endpoint(cls, query: str) -> str:
+        """
+        :param query: GraphQL query
+        :return: graphql followed by the first field queried, without the
+        index of batched aliases, e.g. graphql:repo for repo0, repo1, ...
+        """
+        match = cls.__GRAPHQL_FIELD.search(query)
+        return f"graphql:{match.group(1)}" if match else "graphql"
+
+    def endpoint(self, endpoint: str) -> EndpointMetrics:
+        """
+        :param endpoint: endpoint template
+        :return: the metrics of the endpoint, created on first use
+        """
+        metrics: Optional[EndpointMetrics] = self.__endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self.__endpoints[endpoint] = EndpointMetrics()
+        return metrics
+
+    def record_response(
+        self,
+        endpoint: str,
+        latency: float,
+        size: int,
+        status: int,
+        headers: Mapping[str, str],
+        account: str = "",
+        cost: int = 1,
+    ) -> None:
+        """
+        :param endpoint: endpoint template of the request
+        :param latency: seconds the request took, until its body was read
+        :param size: size of the response body in bytes
+        :param status: HTTP status code of the response
+        :param headers: headers of the response
+        :param account: account the request was made with
+        :param cost: rate limit points the request was charged, as GraphQL
+        queries cost more than 1 depending on the nodes they request
+        """
+        metrics: EndpointMetrics = self.endpoint(endpoint)
+        metrics.requests += 1
+        metrics.bytes += size
+        metrics.observe_latency(latency)
+        if status == HTTPStatus.ACCEPTED.value:
+            metrics.accepted += 1
+        # conditional requests answered 304 Not Modified are not charged
+        if status != HTTPStatus.NOT_MODIFIED.value:
+            metrics.rate_limit_cost += cost
+
+        try:
+            resource: str = headers["X-RateLimit-Resource"]
+            remaining: int = int(headers["X-RateLimit-Remaining"])
+            limit: int = int(headers["X-RateLimit-Limit"])
+        except (KeyError, ValueError):
+            return
+        budget: Optional[dict[str, int]] = self.__rate_limits.setdefault(
+            account, {}
+        ).get(resource)
+        if budget is None or remaining < budget["remaining"]:
+            self.__rate_limits[account][resource] = {
+                "limit": limit,
+                "remaining": remaining,
+            }
+
+    def record_error(self, endpoint: str) -> None:
+        """
+        :param endpoint: endpoint template of a request that failed to connect
+        or with a server error
+        """
+        self.endpoint(endpoint).errors += 1
+
+    def record_retry(self, endpoint: str) -> None:
+        """
+        :param endpoint: endpoint template of a request about to be retried
+        """
+        self.endpoint(endpoint).retries += 1
+
+    def record_cache_hit(self, endpoint: str) -> None:
+        """
+        :param endpoint: endpoint template of a request served from the cache
+        """
+        self.endpoint(endpoint).cache_hits += 1
+
+    def record_stat(self, account: str, name: str, seconds: float) -> None:
+        """
+        :param account: account the statistic was computed for
+        :param name: name of the statistic
+        :param seconds: time taken to compute it, including the statistics it
+        waited on
+        """
+        self.__stats.setdefault(account, {})[name] = round(seconds, 4)
+
+    def report(self) -> dict[str, any]:
+        """
+        :return: all metrics collected so far
+        """
+        endpoints: dict[str, dict[str, any]] = {
+            endpoint: metrics.to_dict()
+            for endpoint, metrics in sorted(self.__endpoints.items())
+        }
+        return {
+            "started_at": self.__started_at,
+            "wall_time": round(monotonic() - self.__start, 4),
+            "requests": sum(e["requests"] for e in endpoints.values()),
+            "endpoints": endpoints,
+            "stats": self.__stats,
+            "rate_limits": self.__rate_limits,
+        }
+
+    def save(
+        self,
+        report_file_path: Optional[str] = None,
+        prometheus_file_path: Optional[str] = None,
+    ) -> None:
+        """
+        Write the metrics to the given files
+        :param report_file_path: path to write the JSON report to, if any
+        :param prometheus_file_path: path to write the Prometheus textfile
+        to, if any
+        """
+        report: dict[str, any] = self.report()
+        if report_file_path:
+            self.__write(
+                file_path=report_file_path, content=dumps(obj=report, indent=2)
+            )
+        if prometheus_file_path:
+            # replaced atomically so that collectors never read a partial file
+            self.__write(
+                file_path=prometheus_file_path,
+                content=self.__prometheus(report=report),
+            )
+
+    @staticmethod
+    def __write(file_path: str, content: str) -> None:
+        makedirs(dirname(abspath(file_path)), exist_ok=True)
+        tmp_file_path: str = file_path + ".tmp"
+        with open(tmp_file_path, "w") as f:
+            f.write(content)
+        replace(tmp_file_path, file_path)
+
+    @staticmethod
+    def __label(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def __prometheus(self, report: dict[str, any]) -> str:
+        prefix: str = self.__PROMETHEUS_PREFIX
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, description: str) -> None:
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        counters: tuple[tuple[str, str, str], ...] = (
+            ("requests", "requests_total", "Requests made to the GitHub APIs"),
+            ("retries", "retries_total", "Requests retried"),
+            ("accepted", "accepted_total", "Responses 202 Accepted"),
+            ("cache_hits", "cache_hits_total", "Responses served from the cache"),
+            ("errors", "errors_total", "Requests failed to connect or by the server"),
+            ("bytes", "response_bytes_total", "Bytes of response bodies"),
+            ("rate_limit_cost", "rate_limit_cost_total", "Rate limit points charged"),
+        )
+        for key, name, description in counters:
+            metric(name=name, kind="counter", description=description)
+            for endpoint, metrics in report["endpoints"].items():
+                lines.append(
+                    f'{prefix}_{name}{{endpoint="{self.__label(endpoint)}"}} '
+                    f"{metrics[key]}"
+                )
+
+        metric(
+            name="request_duration_seconds",
+            kind="histogram",
+            description="Latency of the requests to the GitHub APIs",
+        )
+        for endpoint, metrics in sorted(self.__endpoints.items()):
+            label: str = f'endpoint="{self.__label(endpoint)}"'
+            cumulative: int = 0
+            for bound, count in zip(
+                EndpointMetrics.LATENCY_BUCKETS + (float("inf"),),
+                metrics.latency_counts,
+            ):
+                cumulative += count
+                le: str = "+Inf" if bound == float("inf") else str(bound)
+                lines.append(
+                    f'{prefix}_request_duration_seconds_bucket{{{label},le="{le}"}} '
+                    f"{cumulative}"
+                )
+            lines.append(
+                f"{prefix}_request_duration_seconds_sum{{{label}}} "
+                f"{metrics.latency_sum:.4f}"
+            )
+            lines.append(
+                f"{prefix}_request_duration_seconds_count{{{label}}} "
+                f"{metrics.requests}"
+            )
+
+        metric(
+            name="stat_duration_seconds",
+            kind="gauge",
+            description="Time taken to compute each statistic",
+        )
+        for account, stats in report["stats"].items():
+            for name, seconds in stats.items():
+                lines.append(
+                    f'{prefix}_stat_duration_seconds{{account="{self.__label(account)}",'
+                    f'stat="{self.__label(name)}"}} {seconds}'
+                )
+
+        metric(
+            name="rate_limit_remaining",
+            kind="gauge",
+            description="Lowest rate limit budget left seen during the run",
+        )
+        for account, resources in report["rate_limits"].items():
+            for resource, budget in resources.items():
+                lines.append(
+                    f'{prefix}_rate_limit_remaining{{account="{self.__label(account)}",'
+                    f'resource="{self.__label(resource)}"}} {budget["remaining"]}'
+                )
+
+        metric(
+            name="run_duration_seconds",
+            kind="gauge",
+            description="Wall time of the run",
+        )
+        lines.append(f"{prefix}_run_duration_seconds {report['wall_time']}")
+        metric(
+            name="run_start_time_seconds",
+            kind="gauge",
+            description="Unix time the run started at",
+        )
+        lines.append(f"{prefix}_run_start_time_seconds {report['started_at']:.0f}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+
+from functools import lru_cache
+from re import Pattern, compile
+from xml.sax.saxutils import escape
+
+###############################################################################
+# Markup class
+###############################################################################
+
+
+class Markup(str):
+    """
+    SVG markup inserted into a template as is, without being escaped
+    """
+
+
+###############################################################################
+# SvgTemplate class
+###############################################################################
+
+
+class SvgTemplate:
+    """
+    SVG template with {{ name }} placeholders, split once into the literal
+    text between placeholders and the names of the placeholders so that it
+    can be rendered in a single pass
+    """
+
+    __PLACEHOLDER: Pattern = compile(r"{{ (\w+) }}")
+
+    def __init__(self, source: str) -> None:
+        # split() alternates literal text and placeholder names, starting and
+        # ending with literal text
+        segments: list[str] = self.__PLACEHOLDER.split(source)
+        self.__literals: list[str] = segments[0::2]
+        self.__slots: list[str] = segments[1::2]
+        self.slots: frozenset[str] = frozenset(self.__slots)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def load(file_path: str) -> "SvgTemplate":
+        """
+        :param file_path: path to the SVG template file
+        :return: the compiled template, read and compiled once per file
+        """
+        with open(file_path, "r") as f:
+            return SvgTemplate(source=f.read())
+
+    def render(self, **values: str | Markup) -> str:
+        """
+        :param values: text of each placeholder, escaped for XML unless given
+        as Markup
+        :return: the rendered SVG
+        """
+        missing: set[str] = self.slots - values.keys()
+        if missing:
+            raise KeyError(f"No value for template placeholders: {sorted(missing)}")
+
+        escaped: dict[str, str] = {
+            name: value if isinstance(value, Markup) else escape(str(value))
+            for name, value in values.items()
+        }
+        parts: list[str] = [self.__literals[0]]
+        for slot, literal in zip(self.__slots, self.__literals[1:]):
+            parts.append(escaped[slot])
+            parts.append(literal)
+        return "".join(parts)
@@ -1 +1 @@
-__all__ = ["git_stats_test"]
+__all__ = ["benchmark", "git_stats_test", "mock_github_api"]
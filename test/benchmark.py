@@ -0,0 +1,236 @@
+#!/usr/bin/python3
+
+"""
+Benchmarks generating the statistics and images of a synthetic account against
+a local mock of the GitHub API, reporting the wall time, number of requests and
+peak memory of each run. The exchanges of the runs can be recorded to an
+archive, and runs replayed from an archive, recorded from the mock or from
+GitHub, without any network access. Run from the repository root:
+python -m test.benchmark
+"""
+
+from argparse import ArgumentParser, Namespace
+from asyncio import run
+from aiohttp import ClientSession
+from contextlib import nullcontext
+from json import dump
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Optional
+from tracemalloc import get_traced_memory
+from tracemalloc import start as start_tracing
+from tracemalloc import stop as stop_tracing
+
+from src.db.history import StatsHistory
+from src.db.repo_snapshots import RepoSnapshots
+from src.db.response_cache import ResponseCache
+from src.env_vars import EnvironmentVariables
+from src.generate_images import GenerateImages
+from src.github_repo_stats import GitHubRepoStats
+from src.record_replay import RecordingSession, ReplaySession
+from src.run_metrics import RunMetrics
+from test.mock_github_api import MockGitHubApiProcess, SyntheticAccount
+
+SCENARIOS: tuple[str, ...] = ("stats", "images")
+
+
+async def run_scenario(
+    scenario: str,
+    api_url: Optional[str],
+    storage_dir: str,
+    args: Namespace,
+    metrics: RunMetrics,
+    recording: Optional[list[dict[str, any]]] = None,
+    replay: Optional[ReplaySession] = None,
+) -> None:
+    """
+    Generate the statistics, or the images, of the synthetic account once,
+    keeping all stored data in the storage directory
+    :param scenario: "stats" for GitHubRepoStats, "images" for GenerateImages
+    :param api_url: URL of the mock API, None when replaying
+    :param storage_dir: directory for the caches and stored statistics
+    :param args: benchmark options
+    :param metrics: metrics to record the run into
+    :param recording: exchanges recorded so far, to record this run into
+    :param replay: session replaying an archive, instead of the mock API
+    """
+    environment_vars: EnvironmentVariables = EnvironmentVariables(
+        username=args.username,
+        access_token="benchmark",
+        max_connections=str(args.max_connections),
+        db_file_path=join(storage_dir, "db.json"),
+        api_url=api_url,
+    )
+    response_cache: ResponseCache = ResponseCache(
+        file_path=join(storage_dir, "response_cache.json")
+    )
+    history: StatsHistory = StatsHistory(file_path=join(storage_dir, "history.sqlite"))
+    snapshots: RepoSnapshots = RepoSnapshots(
+        username=args.username, file_path=join(storage_dir, "repo_snapshots.json")
+    )
+
+    async with ClientSession() as client_session:
+        session: ClientSession | RecordingSession | ReplaySession = client_session
+        if replay is not None:
+            session = replay
+        elif recording is not None:
+            session = RecordingSession(
+                session=client_session,
+                archive_path=args.record,
+                exchanges=recording,
+            )
+
+        if scenario == "stats":
+            stats: GitHubRepoStats = GitHubRepoStats(
+                environment_vars=environment_vars,
+                session=session,
+                response_cache=response_cache,
+                history=history,
+                snapshots=snapshots,
+                metrics=metrics,
+            )
+            await stats.to_str()
+            await stats.pull_requests
+            await stats.issues
+            stats.save_history()
+        else:
+            generator: GenerateImages = GenerateImages(
+                environment_vars=environment_vars,
+                output_dir=join(storage_dir, "generated_images"),
+            )
+            await generator.generate(
+                session=session,
+                response_cache=response_cache,
+                history=history,
+                snapshots=snapshots,
+                metrics=metrics,
+            )
+            generator.save()
+
+        if isinstance(session, RecordingSession):
+            session.save()
+
+    response_cache.save()
+    environment_vars.commit()
+
+
+def main() -> None:
+    parser: ArgumentParser = ArgumentParser(description=__doc__)
+    parser.add_argument("--username", default="octocat")
+    parser.add_argument("--owned-repos", type=int, default=30)
+    parser.add_argument("--contributed-repos", type=int, default=10)
+    parser.add_argument("--weeks", type=int, default=52, help="weeks of history")
+    parser.add_argument("--contributors", type=int, default=3, help="per repo")
+    parser.add_argument("--latency", type=float, default=50, help="milliseconds")
+    parser.add_argument(
+        "--accepted", type=int, default=1, help="202s per contributor statistics"
+    )
+    parser.add_argument("--max-connections", type=int, default=10)
+    parser.add_argument(
+        "--runs", type=int, default=2, help="first cold, then with warm caches"
+    )
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc")
+    parser.add_argument("--json", help="file to write the results to")
+    parser.add_argument("--record", help="archive to record the exchanges to")
+    parser.add_argument(
+        "--replay", help="archive to replay the exchanges from, instead of the mock"
+    )
+    parser.add_argument(
+        "--replay-latency",
+        action="store_true",
+        help="delay replayed responses by their recorded latency",
+    )
+    args: Namespace = parser.parse_args()
+
+    account: SyntheticAccount = SyntheticAccount(
+        username=args.username,
+        owned_repos=args.owned_repos,
+        contributed_repos=args.contributed_repos,
+        weeks=args.weeks,
+        contributors=args.contributors,
+    )
+    scenarios: tuple[str, ...] = (
+        SCENARIOS if args.scenario == "all" else (args.scenario,)
+    )
+    results: list[dict[str, any]] = []
+    recording: Optional[list[dict[str, any]]] = [] if args.record else None
+    replay: Optional[ReplaySession] = (
+        ReplaySession(
+            archive_path=args.replay, is_latency_simulated=args.replay_latency
+        )
+        if args.replay
+        else None
+    )
+
+    print(
+        f"{'scenario':<10}{'run':>4}{'wall time (s)':>15}{'requests':>10}{'peak memory (MiB)':>19}"
+    )
+    with (
+        nullcontext()
+        if replay is not None
+        else MockGitHubApiProcess(
+            account=account, latency=args.latency / 1000, accepted=args.accepted
+        )
+    ) as api:
+        for scenario in scenarios:
+            with TemporaryDirectory() as storage_dir:
+                for i in range(args.runs):
+                    if api is not None:
+                        api.reset()
+                    replayed_requests: int = 0 if replay is None else replay.requests
+                    if not args.no_memory:
+                        start_tracing()
+
+                    metrics: RunMetrics = RunMetrics()
+                    start: float = perf_counter()
+                    run(
+                        run_scenario(
+                            scenario=scenario,
+                            api_url=None if api is None else api.url,
+                            storage_dir=storage_dir,
+                            args=args,
+                            metrics=metrics,
+                            recording=recording,
+                            replay=replay,
+                        )
+                    )
+                    wall_time: float = perf_counter() - start
+
+                    peak_memory: Optional[int] = None
+                    if not args.no_memory:
+                        peak_memory = get_traced_memory()[1]
+                        stop_tracing()
+
+                    requests: dict[str, int] = (
+                        {"requests": replay.requests - replayed_requests}
+                        if api is None
+                        else api.stats()
+                    )
+                    results.append(
+                        {
+                            "scenario": scenario,
+                            "run": i + 1,
+                            "wall_time": wall_time,
+                            "requests": requests.get("requests", 0),
+                            "requests_by_endpoint": requests,
+                            "peak_memory": peak_memory,
+                            "report": metrics.report(),
+                        }
+                    )
+                    print(
+                        f"{scenario:<10}{i + 1:>4}{wall_time:>15.3f}"
+                        f"{requests.get('requests', 0):>10}"
+                        f"{'-' if peak_memory is None else f'{peak_memory / 2**20:.1f}':>19}"
+                    )
+
+    if replay is not None and replay.missing:
+        print(f"{replay.missing} requests had no recorded response")
+    if args.json:
+        with open(args.json, "w") as f:
+            dump(obj={"options": vars(args), "results": results}, fp=f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,14 @@
 Prints GitHub repository statistics to console for testing
 """
 
-from asyncio import run, set_event_loop_policy, WindowsSelectorEventLoopPolicy
+from asyncio import run
 from aiohttp import ClientSession
 from os import getenv
+from sys import platform
 
 from src.github_repo_stats import GitHubRepoStats
 from src.env_vars import EnvironmentVariables
+from src.record_replay import RecordingSession, ReplaySession
 
 # REQUIRED
 ACCESS_TOKEN: str = getenv("ACCESS_TOKEN")  # or manually enter ACCESS_TOKEN string
@@ -40,22 +42,41 @@ EXCLUDED_COLLAB_REPOS: str = getenv(
     "EXCLUDED_COLLAB_REPOS"
 )  # or enter: '[owner/repo],...'
 MORE_COLLAB_REPOS: str = getenv("MORE_COLLAB_REPOS")  # or enter: '[owner/repo],...'
+MAX_CONNECTIONS: str = getenv("MAX_CONNECTIONS")  # or enter: '<int>'
+RESPONSE_CACHE_SIZE_MB: str = getenv("RESPONSE_CACHE_SIZE_MB")  # or enter: '<int>'
+
+# record the exchanges with the API to an archive, or replay them from one
+RECORD_ARCHIVE: str = getenv("RECORD_ARCHIVE")  # or enter: '<path>'
+REPLAY_ARCHIVE: str = getenv("REPLAY_ARCHIVE")  # or enter: '<path>'
+IS_REPLAY_LATENCY: str = getenv("IS_REPLAY_LATENCY")  # or enter: '<bool>'
 
 
 async def main() -> None:
     """
     Used for testing
     """
-    if not (ACCESS_TOKEN and GITHUB_ACTOR):
+    if not ((ACCESS_TOKEN or REPLAY_ARCHIVE) and GITHUB_ACTOR):
         raise RuntimeError(
             "ACCESS_TOKEN and GITHUB_ACTOR environment variables can't be None"
         )
 
-    async with ClientSession() as session:
+    async with ClientSession() as client_session:
+        session: ClientSession | RecordingSession | ReplaySession = client_session
+        if REPLAY_ARCHIVE:
+            session = ReplaySession(
+                archive_path=REPLAY_ARCHIVE,
+                is_latency_simulated=(IS_REPLAY_LATENCY or "").strip().lower()
+                == "true",
+            )
+        elif RECORD_ARCHIVE:
+            session = RecordingSession(
+                session=client_session, archive_path=RECORD_ARCHIVE
+            )
+
         stats: GitHubRepoStats = GitHubRepoStats(
             environment_vars=EnvironmentVariables(
                 username=GITHUB_ACTOR,
-                access_token=ACCESS_TOKEN,
+                access_token=ACCESS_TOKEN or "replay",
                 exclude_repos=EXCLUDED_REPOS,
                 exclude_langs=EXCLUDED_LANGS,
                 exclude_repo_langs=EXCLUDED_REPO_LANGS,
@@ -74,12 +95,22 @@ async def main() -> None:
                 only_included_collab_repos=ONLY_INCLUDED_COLLAB_REPOS,
                 exclude_collab_repos=EXCLUDED_COLLAB_REPOS,
                 more_collab_repos=MORE_COLLAB_REPOS,
+                max_connections=MAX_CONNECTIONS,
+                response_cache_size_mb=RESPONSE_CACHE_SIZE_MB,
             ),
             session=session,
         )
         print(await stats.to_str())
+        stats.queries.save_response_cache()
+        stats.save_history()
+        stats.environment_vars.commit()
+        if isinstance(session, RecordingSession):
+            session.save()
 
 
 if __name__ == "__main__":
-    set_event_loop_policy(policy=WindowsSelectorEventLoopPolicy())
+    if platform == "win32":
+        from asyncio import set_event_loop_policy, WindowsSelectorEventLoopPolicy
+
+        set_event_loop_policy(policy=WindowsSelectorEventLoopPolicy())
     run(main=main())
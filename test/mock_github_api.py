@@ -0,0 +1,441 @@
+#!/usr/bin/python3
+
+"""
+Local mock of the GitHub GraphQL and REST API endpoints used to generate the
+statistics, serving a synthetic account, for running benchmarks offline
+"""
+
+from aiohttp import web
+from asyncio import run, sleep
+from datetime import date, datetime, timedelta, timezone
+from hashlib import sha256
+from json import dumps, loads
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from random import Random
+from re import findall, finditer, search
+from typing import Optional
+from urllib.request import Request, urlopen
+
+###############################################################################
+# SyntheticAccount class
+###############################################################################
+
+
+class SyntheticAccount:
+    """
+    Deterministic synthetic GitHub account with owned repos and repos of
+    organizations contributed to, each with a contributor statistics history
+    """
+
+    __LANGUAGES: list[tuple[str, str]] = [
+        ("Python", "#3572A5"),
+        ("JavaScript", "#f1e05a"),
+        ("TypeScript", "#3178c6"),
+        ("Java", "#b07219"),
+        ("C", "#555555"),
+        ("C++", "#f34b7d"),
+        ("Go", "#00ADD8"),
+        ("Rust", "#dea584"),
+        ("Shell", "#89e051"),
+        ("HTML", "#e34c26"),
+    ]
+    __WEEK: int = 7 * 24 * 60 * 60  # seconds
+
+    def __init__(
+        self,
+        username: str = "octocat",
+        owned_repos: int = 30,
+        contributed_repos: int = 10,
+        weeks: int = 52,
+        contributors: int = 3,
+        languages: int = 3,
+        years: int = 5,
+        seed: int = 0,
+    ) -> None:
+        self.username: str = username
+        self.weeks: int = weeks
+        self.repos: dict[str, dict[str, any]] = dict()
+
+        rand: Random = Random(seed)
+        first_week: int = int(
+            datetime.now(tz=timezone.utc).timestamp() // self.__WEEK - weeks
+        )
+        today: date = date.today()
+
+        repo_names: list[str] = [f"{username}/repo-{i}" for i in range(owned_repos)] + [
+            f"org-{i % 3}/shared-{i}" for i in range(contributed_repos)
+        ]
+
+        for i, repo_name in enumerate(repo_names):
+            is_owned: bool = i < owned_repos
+            authors: list[str] = [username] + [
+                f"contributor-{rand.randrange(contributors * 4)}"
+                for _ in range(contributors - 1)
+            ]
+            self.repos[repo_name] = {
+                "node": {
+                    "nameWithOwner": repo_name,
+                    "stargazers": {"totalCount": rand.randrange(500)},
+                    "forkCount": rand.randrange(50),
+                    "isFork": is_owned and i % 7 == 6,
+                    "isEmpty": False,
+                    "isArchived": i % 5 == 4,
+                    "isPrivate": is_owned and i % 4 == 3,
+                    "pushedAt": (
+                        datetime.fromtimestamp(
+                            (first_week + weeks) * self.__WEEK - i * 3600,
+                            tz=timezone.utc,
+                        ).strftime("%Y-%m-%dT%H:%M:%SZ")
+                    ),
+                    "viewerPermission": (
+                        "ADMIN" if is_owned else ("WRITE" if i % 2 else "READ")
+                    ),
+                    "languages": {
+                        "edges": [
+                            {
+                                "size": rand.randrange(1, 100000),
+                                "node": {"name": n, "color": c},
+                            }
+                            for n, c in rand.sample(self.__LANGUAGES, k=languages)
+                        ]
+                    },
+                    "collaborators": {
+                        "totalCount": len(set(authors)),
+                        "nodes": [{"login": login} for login in sorted(set(authors))],
+                    },
+                },
+                "contributors": [
+                    {
+                        "author": {"login": author},
+                        "total": 0,
+                        "weeks": [
+                            {
+                                "w": (first_week + k) * self.__WEEK,
+                                "a": rand.randrange(200),
+                                "d": rand.randrange(100),
+                                "c": rand.randrange(10),
+                            }
+                            for k in range(weeks)
+                        ],
+                    }
+                    for author in dict.fromkeys(authors)
+                ],
+                "views": [
+                    {
+                        "timestamp": f"{today - timedelta(days)}T00:00:00Z",
+                        "count": rand.randrange(30),
+                        "uniques": rand.randrange(5),
+                    }
+                    for days in range(14, -1, -1)
+                ],
+                "pull_requests": rand.randrange(20),
+                "issues": rand.randrange(20),
+            }
+
+        self.contributions: dict[int, int] = {
+            year: rand.randrange(2000)
+            for year in range(today.year - years + 1, today.year + 1)
+        }
+
+
+###############################################################################
+# MockGitHubApi class
+###############################################################################
+
+
+class MockGitHubApi:
+    """
+    aiohttp application emulating the GitHub API endpoints used to generate the
+    statistics for a synthetic account. Counts the requests made by endpoint
+    and the peak number of concurrent requests
+    """
+
+    __RATE_LIMIT: int = 5000
+
+    def __init__(
+        self,
+        account: SyntheticAccount,
+        latency: float = 0.0,
+        accepted: int = 1,
+    ) -> None:
+        """
+        :param account: account the API is emulated for
+        :param latency: seconds each response is delayed by
+        :param accepted: number of 202 Accepted responses to the first requests
+        for the contributor statistics of each repo, as while GitHub computes them
+        """
+        self.__account: SyntheticAccount = account
+        self.__latency: float = latency
+        self.__accepted: int = accepted
+        self.__bodies: dict[str, bytes] = dict()
+        self.__accepted_left: dict[str, int] = dict()
+        self.__counts: dict[str, int] = dict()
+        self.__in_flight: int = 0
+        self.__peak_in_flight: int = 0
+
+    def app(self) -> web.Application:
+        """
+        :return: the application serving the mock API
+        """
+        app: web.Application = web.Application(middlewares=[self.__track])
+        app.router.add_get("/_mock/stats", self.__stats)
+        app.router.add_post("/_mock/reset", self.__reset)
+        app.router.add_post("/graphql", self.__graphql)
+        app.router.add_get("/repos/{owner}/{name}/{endpoint:.+}", self.__rest)
+        return app
+
+    @web.middleware
+    async def __track(self, request: web.Request, handler) -> web.StreamResponse:
+        if request.path.startswith("/_mock/"):
+            return await handler(request)
+
+        self.__in_flight += 1
+        self.__peak_in_flight = max(self.__peak_in_flight, self.__in_flight)
+        try:
+            if self.__latency > 0:
+                await sleep(self.__latency)
+            response: web.StreamResponse = await handler(request)
+        finally:
+            self.__in_flight -= 1
+
+        self.__count("requests")
+        self.__count(f"status_{response.status}")
+        response.headers["X-RateLimit-Limit"] = str(self.__RATE_LIMIT)
+        response.headers["X-RateLimit-Remaining"] = str(self.__RATE_LIMIT)
+        response.headers["X-RateLimit-Reset"] = str(
+            int(datetime.now(tz=timezone.utc).timestamp()) + 3600
+        )
+        return response
+
+    def __count(self, name: str) -> None:
+        self.__counts[name] = self.__counts.get(name, 0) + 1
+
+    async def __stats(self, _: web.Request) -> web.Response:
+        return web.json_response(
+            {**self.__counts, "peak_in_flight": self.__peak_in_flight}
+        )
+
+    async def __reset(self, _: web.Request) -> web.Response:
+        self.__counts = dict()
+        self.__peak_in_flight = 0
+        self.__accepted_left = dict()
+        return web.json_response({})
+
+    async def __graphql(self, request: web.Request) -> web.Response:
+        self.__count("graphql")
+        query: str = (await request.json()).get("query", "")
+        data: dict[str, any] = dict()
+
+        if "viewer" in query:
+            viewer: dict[str, any] = dict()
+            if search(r"\blogin\b", query):
+                viewer["login"] = self.__account.username
+                viewer["name"] = self.__account.username.title()
+
+            for match in finditer(
+                r"\b(repositories|repositoriesContributedTo)\(([^)]*)\)", query
+            ):
+                connection: Optional[dict[str, any]] = self.__repos_page(
+                    is_owned=match.group(1) == "repositories", arguments=match.group(2)
+                )
+                if connection is None:
+                    return web.json_response(
+                        {"errors": [{"message": "Parse error in repository arguments"}]}
+                    )
+                viewer[match.group(1)] = connection
+
+            if search(r"contributionYears", query):
+                viewer.setdefault("contributionsCollection", {})[
+                    "contributionYears"
+                ] = sorted(self.__account.contributions, reverse=True)
+            for alias, year in findall(
+                r"(\w+): contributionsCollection\(\s*from: \"(\d{4})", query
+            ):
+                viewer[alias] = {
+                    "contributionCalendar": {
+                        "totalContributions": self.__account.contributions.get(
+                            int(year), 0
+                        )
+                    }
+                }
+            data["viewer"] = viewer
+
+        for alias, owner, name in findall(
+            r"(\w+): repository\(owner: \"([^\"]+)\", name: \"([^\"]+)\"\)", query
+        ):
+            repo: Optional[dict[str, any]] = self.__account.repos.get(f"{owner}/{name}")
+            data[alias] = repo["node"] if repo is not None else None
+
+        for alias, search_query in findall(
+            r"(\w+): search\(type: ISSUE, query: (\"(?:[^\"\\]|\\.)*\")", query
+        ):
+            data[alias] = {"issueCount": self.__search_count(loads(search_query))}
+
+        if search(r"\brateLimit\b", query):
+            data["rateLimit"] = {"cost": 1}
+
+        return web.json_response({"data": data})
+
+    def __repos_page(self, is_owned: bool, arguments: str) -> Optional[dict[str, any]]:
+        after: Optional[str] = None
+        if "after:" in arguments:
+            match = search(r"after:\s*(null|\"([^\"]*)\")\s*,?\s*$", arguments)
+            if match is None:
+                return None
+            after = match.group(2)
+        first_match = search(r"first:\s*(\d+)", arguments)
+        first: int = int(first_match.group(1)) if first_match else 100
+
+        nodes: list[dict[str, any]] = [
+            repo["node"]
+            for repo_name, repo in self.__account.repos.items()
+            if repo_name.startswith(f"{self.__account.username}/") == is_owned
+        ]
+        for argument, field in (("isFork", "isFork"), ("isArchived", "isArchived")):
+            match = search(rf"{argument}:\s*(true|false)", arguments)
+            if match is not None:
+                nodes = [n for n in nodes if n[field] == (match.group(1) == "true")]
+        match = search(r"privacy:\s*(PUBLIC|PRIVATE)", arguments)
+        if match is not None:
+            nodes = [
+                n for n in nodes if n["isPrivate"] == (match.group(1) == "PRIVATE")
+            ]
+
+        start: int = int(after.rpartition(":")[2]) if after else 0
+        end: int = start + first
+        return {
+            "pageInfo": {"hasNextPage": end < len(nodes), "endCursor": f"cursor:{end}"},
+            "nodes": nodes[start:end],
+        }
+
+    def __search_count(self, search_query: str) -> int:
+        repo_names: list[str] = findall(r"repo:(\S+)", search_query)
+        field: str = "pull_requests" if "is:pr" in search_query else "issues"
+        return sum(
+            repo[field]
+            for repo_name, repo in self.__account.repos.items()
+            if not repo_names or repo_name in repo_names
+        )
+
+    async def __rest(self, request: web.Request) -> web.Response:
+        repo_name: str = f"{request.match_info['owner']}/{request.match_info['name']}"
+        endpoint: str = request.match_info["endpoint"]
+        self.__count(endpoint.replace("/", "_"))
+
+        repo: Optional[dict[str, any]] = self.__account.repos.get(repo_name)
+        if repo is None:
+            return web.json_response({"message": "Not Found"}, status=404)
+
+        if endpoint == "stats/contributors":
+            body: any = repo["contributors"]
+        elif endpoint in ("traffic/views", "traffic/clones"):
+            if repo["node"]["viewerPermission"] in ("READ", "TRIAGE"):
+                return web.json_response(
+                    {"message": "Must have push access to repository"}, status=403
+                )
+            kind: str = endpoint.partition("/")[2]
+            body = {
+                "count": sum(day["count"] for day in repo["views"]),
+                "uniques": sum(day["uniques"] for day in repo["views"]),
+                kind: repo["views"],
+            }
+        elif endpoint == "collaborators":
+            body = repo["node"]["collaborators"]["nodes"]
+        elif endpoint == "languages":
+            body = {
+                edge["node"]["name"]: edge["size"]
+                for edge in repo["node"]["languages"]["edges"]
+            }
+        else:
+            return web.json_response({"message": "Not Found"}, status=404)
+
+        if request.path not in self.__bodies:
+            self.__bodies[request.path] = dumps(body).encode()
+        etag: str = f'"{sha256(self.__bodies[request.path]).hexdigest()[:16]}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        if endpoint == "stats/contributors":
+            accepted_left: int = self.__accepted_left.setdefault(
+                request.path, self.__accepted
+            )
+            if accepted_left > 0:
+                self.__accepted_left[request.path] = accepted_left - 1
+                return web.json_response({}, status=202)
+
+        return web.Response(
+            body=self.__bodies[request.path],
+            content_type="application/json",
+            headers={"ETag": etag},
+        )
+
+
+###############################################################################
+# MockGitHubApiProcess class
+###############################################################################
+
+
+def _serve(connection: Connection, account: SyntheticAccount, **options) -> None:
+    """
+    Serve the mock API on a free local port, sending the port to the connection
+    """
+
+    async def start() -> None:
+        runner: web.AppRunner = web.AppRunner(
+            MockGitHubApi(account=account, **options).app()
+        )
+        await runner.setup()
+        await web.TCPSite(runner, host="127.0.0.1", port=0).start()
+        connection.send(runner.addresses[0][1])
+        while True:
+            await sleep(3600)
+
+    run(start())
+
+
+class MockGitHubApiProcess:
+    """
+    Runs the mock API in a separate process, so that serving requests does not
+    take time or memory from the code being measured
+    """
+
+    def __init__(self, account: SyntheticAccount, **options) -> None:
+        """
+        :param account: account the API is emulated for
+        :param options: options of MockGitHubApi
+        """
+        self.__account: SyntheticAccount = account
+        self.__options: dict[str, any] = options
+        self.__process: Optional[Process] = None
+        self.url: Optional[str] = None
+
+    def __enter__(self) -> "MockGitHubApiProcess":
+        receiver, sender = Pipe(duplex=False)
+        self.__process = Process(
+            target=_serve,
+            args=(sender, self.__account),
+            kwargs=self.__options,
+            daemon=True,
+        )
+        self.__process.start()
+        self.url = f"http://127.0.0.1:{receiver.recv()}/"
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.__process.terminate()
+        self.__process.join()
+
+    def stats(self) -> dict[str, int]:
+        """
+        :return: number of requests made by endpoint and status since the last
+        reset, with the peak number of concurrent requests
+        """
+        with urlopen(self.url + "_mock/stats") as response:
+            return loads(response.read())
+
+    def reset(self) -> None:
+        """
+        Reset the request counts, and the 202 Accepted responses still to come
+        """
+        urlopen(Request(self.url + "_mock/reset", method="POST")).close()